@@ -0,0 +1,127 @@
+# auto_delete.py
+
+import asyncio
+import heapq
+import logging
+import os
+import time
+
+from rate_limit import PRIORITY_CLEANUP, priority_args
+from storage import persistence
+
+logger = logging.getLogger(__name__)
+
+# 🗑️ Через сколько секунд удалять служебные уведомления и насколько раньше срока их можно
+# прихватить в общую пачку
+AUTO_DELETE_DELAY = float(os.getenv("AUTO_DELETE_DELAY", "8"))
+AUTO_DELETE_BATCH_WINDOW = float(os.getenv("AUTO_DELETE_BATCH_WINDOW", "1"))
+_MAX_BULK = 100  # лимит deleteMessages на один вызов
+_STORE_NAMESPACE = "auto_delete"
+
+
+class DeleteScheduler:
+    """Отложенное удаление сообщений: одна куча сроков и одна задача-драйвер.
+
+    Сроки хранятся в wall-clock (time.time()), а очередь регистрируется в persistence,
+    поэтому неудалённые уведомления переживают рестарт. Созревшие сообщения (и те, чей
+    срок наступит в пределах batch_window) группируются по чатам и удаляются вызовом
+    deleteMessages — по одному запросу на чат вместо одного на сообщение.
+    """
+
+    def __init__(self, delay=AUTO_DELETE_DELAY, batch_window=AUTO_DELETE_BATCH_WINDOW):
+        self.delay = delay
+        self.batch_window = batch_window
+        self._pending = {}      # chat_id -> {message_id: срок}; это и сохраняется
+        self._heap = []         # (срок, chat_id, message_id); отменённые записи пропускаются
+        self._bot = None
+        self._wakeup = None     # asyncio.Event драйвера; создаётся в start(), в работающем event loop
+        self._task = None
+        self._deleting = set()  # задачи deleteMessages в полёте
+        persistence.register(_STORE_NAMESPACE, self._pending)
+
+    def schedule(self, chat_id, message_id, delay=None):
+        due = time.time() + (self.delay if delay is None else delay)
+        self._pending.setdefault(chat_id, {})[message_id] = due
+        persistence.touch(_STORE_NAMESPACE, chat_id)
+        self._push(due, chat_id, message_id)
+
+    def cancel(self, chat_id, message_id):
+        messages = self._pending.get(chat_id)
+        if messages and messages.pop(message_id, None) is not None:
+            if not messages:
+                del self._pending[chat_id]
+            persistence.touch(_STORE_NAMESPACE, chat_id)
+
+    def depth(self, chat_id=None):
+        """Сколько сообщений ждут удаления (в чате или всего)."""
+        if chat_id is not None:
+            return len(self._pending.get(chat_id, ()))
+        return sum(len(messages) for messages in self._pending.values())
+
+    def _push(self, due, chat_id, message_id):
+        heapq.heappush(self._heap, (due, chat_id, message_id))
+        if self._wakeup is not None and self._heap[0] == (due, chat_id, message_id):
+            self._wakeup.set()
+
+    async def start(self, bot, owns=None):
+        """Запустить драйвер и поднять недоудалённое до рестарта (owns — только свои чаты)."""
+        self._bot = bot
+        restored = await persistence.restore_all(_STORE_NAMESPACE, owns)
+        if restored:
+            for chat_id, messages in self._pending.items():
+                for message_id, due in messages.items():
+                    heapq.heappush(self._heap, (due, chat_id, message_id))
+            logger.info(f"🗑️ Восстановлено отложенных удалений: {self.depth()}")
+        if self._task is None or self._task.done():
+            # main() при сбое перезапускается в новом event loop — Event старого туда не годится
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for chat_id, message_ids in self._pop_due(time.time() + self.batch_window).items():
+                task = asyncio.create_task(self._delete(chat_id, message_ids))
+                self._deleting.add(task)
+                task.add_done_callback(self._deleting.discard)
+
+    def _pop_due(self, until):
+        due_by_chat = {}
+        while self._heap and self._heap[0][0] <= until:
+            due, chat_id, message_id = heapq.heappop(self._heap)
+            messages = self._pending.get(chat_id)
+            if not messages or messages.get(message_id) != due:
+                continue  # отменено или перепланировано
+            del messages[message_id]
+            if not messages:
+                del self._pending[chat_id]
+            persistence.touch(_STORE_NAMESPACE, chat_id)
+            due_by_chat.setdefault(chat_id, []).append(message_id)
+        return due_by_chat
+
+    async def _delete(self, chat_id, message_ids):
+        for start in range(0, len(message_ids), _MAX_BULK):
+            chunk = message_ids[start:start + _MAX_BULK]
+            try:
+                await self._bot.delete_messages(chat_id=chat_id, message_ids=chunk,
+                                                **priority_args(self._bot, PRIORITY_CLEANUP, max_wait=None))
+            except Exception as e:
+                # Сообщение уже удалено вручную или старше 48 часов — не страшно
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"🗑️ Не удалось удалить {chunk} в чате {chat_id}: {e}")
+
+
+# Общий экземпляр для всех модулей
+deleter = DeleteScheduler()
@@ -0,0 +1,207 @@
+# batch.py
+
+import argparse
+import multiprocessing
+import pickle
+import random
+import time
+
+from engines import BlackWhiteEngine, DoublePigEngine, Finished, PigHold, PigRoll, is_rejected
+from models import BlackWhiteGame, DoublePigGame
+
+ENGINES = ("black_white", "double_pig")
+# Партия, не закончившаяся за столько действий, считается зависшей
+MAX_ACTIONS = 100_000
+
+
+class InvariantError(AssertionError):
+    pass
+
+
+def _check(condition, message):
+    if not condition:
+        raise InvariantError(message)
+
+
+# 🎲 Случайные партии: игроки жмут только разрешённые кнопки
+def play_black_white(engine, rng):
+    game = BlackWhiteGame()
+    n_players = rng.randint(2, 4)
+    for user_id in range(1, n_players + 1):
+        engine.join(game, user_id, f"player{user_id}")
+    engine.set_rounds(game, rng.randint(2, 6))
+    engine.set_dice(game, rng.choice(engine.DICE))
+    for _ in range(MAX_ACTIONS):
+        user_id = game.current_player
+        if game.players[user_id].pending_draw:
+            events = engine.roll(game, user_id)
+        else:
+            events = engine.draw(game, user_id)
+        if is_rejected(events):
+            raise InvariantError(f"разрешённое действие отклонено: {events[0].text}")
+        if type(events[-1]) is Finished:
+            check_black_white(engine, game, events[-1].winner_id)
+            return game
+    raise InvariantError("партия «Чёрные-Белые» не закончилась")
+
+
+def play_double_pig(engine, rng, hold_chance=0.3):
+    game = DoublePigGame()
+    n_players = rng.randint(2, engine.MAX_PLAYERS)
+    for user_id in range(1, n_players + 1):
+        engine.join(game, user_id, f"player{user_id}")
+    engine.set_target(game, rng.choice(engine.TARGETS))
+    entries = []    # полная история: в game.history только последние записи
+    for _ in range(MAX_ACTIONS):
+        user_id = game.current_player
+        player = game.players[user_id]
+        if not player.must_roll and player.turn_points and rng.random() < hold_chance:
+            events = engine.hold(game, user_id)
+        else:
+            events = engine.roll(game, user_id)
+        if is_rejected(events):
+            raise InvariantError(f"разрешённое действие отклонено: {events[0].text}")
+        entries.append(events[0])
+        if type(events[-1]) is Finished:
+            check_double_pig(game, events[-1].winner_id, entries)
+            return game
+    raise InvariantError("партия «Двойная свинка» не закончилась")
+
+
+# 🔍 Инварианты завершённых партий
+def check_black_white(engine, game, winner_id):
+    _check(game.phase == "finished", "фаза не finished")
+    _check(len(game.round_history) == game.rounds_total, "число раундов в истории")
+    white, black = {}, {}
+    for rnd, throws in enumerate(game.round_history, 1):
+        _check({t.user_id for t in throws} == set(game.players), f"в раунде {rnd} бросили не все")
+        for t in throws:
+            _check(all(1 <= v <= 6 for v in t.whites + t.blacks), f"значение кубика вне 1..6: {t}")
+            white[t.user_id] = white.get(t.user_id, 0) + sum(t.whites)
+            black[t.user_id] = black.get(t.user_id, 0) + sum(t.blacks)
+    for user_id, p in game.players.items():
+        _check((p.white_total, p.black_total) == (white[user_id], black[user_id]), f"счёт {user_id} не сходится")
+        _check(p.pending_draw is None, f"у {user_id} остались невыброшенные кубики")
+    _check(winner_id == engine.winner(game), "победитель не совпадает")
+
+
+def check_double_pig(game, winner_id, entries):
+    _check(game.phase == "finished", "фаза не finished")
+    _check(list(game.history) == entries[-len(game.history):], "история не совпадает с последними ходами")
+    totals, turn = dict.fromkeys(game.players, 0), dict.fromkeys(game.players, 0)
+    for entry in entries:
+        if type(entry) is PigHold:
+            _check(entry.added == turn[entry.user_id], f"сохранено {entry.added}, набрано {turn[entry.user_id]}")
+            totals[entry.user_id] += entry.added
+            turn[entry.user_id] = 0
+        elif entry.d1 == 1 or entry.d2 == 1:
+            turn[entry.user_id] = 0
+            if entry.d1 == entry.d2:
+                totals[entry.user_id] = 0
+        else:
+            turn[entry.user_id] += (entry.d1 + entry.d2) * (2 if entry.d1 == entry.d2 else 1)
+    for user_id, p in game.players.items():
+        _check(p.total == totals[user_id], f"счёт {user_id}: {p.total} != {totals[user_id]}")
+    _check(game.players[winner_id].total >= game.target_score, "победитель не набрал цель")
+    others = [p.total for uid, p in game.players.items() if uid != winner_id]
+    _check(all(total < game.target_score for total in others), "цель набрал не только победитель")
+
+
+# 🐒 Хаос: случайные игроки (и посторонние) жмут случайные кнопки
+def _chaos_actions(engine, rng):
+    user_id = rng.randint(1, 6)
+    if isinstance(engine, BlackWhiteEngine):
+        return rng.choice((
+            lambda g: engine.join(g, user_id, f"player{user_id}"),
+            lambda g: engine.set_rounds(g, rng.randint(0, 25)),
+            lambda g: engine.set_dice(g, rng.randint(0, 9)),
+            lambda g: engine.draw(g, user_id),
+            lambda g: engine.roll(g, user_id),
+            lambda g: engine.draw(g, g.current_player),
+            lambda g: engine.roll(g, g.current_player),
+        ))
+    return rng.choice((
+        lambda g: engine.join(g, user_id, f"player{user_id}"),
+        lambda g: engine.set_target(g, rng.choice((-5, 0, 50, 100))),
+        lambda g: engine.roll(g, user_id),
+        lambda g: engine.hold(g, user_id),
+        lambda g: engine.roll(g, g.current_player),
+        lambda g: engine.hold(g, g.current_player),
+    ))
+
+
+def play_chaos(name, engine, rng):
+    game = BlackWhiteGame() if name == "black_white" else DoublePigGame()
+    entries = []
+    for _ in range(MAX_ACTIONS):
+        action = _chaos_actions(engine, rng)
+        before = pickle.dumps(game)
+        try:
+            events = action(game)
+        except Exception as e:
+            raise InvariantError(f"исключение в движке ({game.phase}): {e!r}") from e
+        _check(bool(events), "действие без событий")
+        if is_rejected(events):
+            _check(pickle.dumps(game) == before, f"отказ изменил состояние: {events[0].text}")
+        elif type(events[0]) in (PigRoll, PigHold):
+            entries.append(events[0])
+        if type(events[-1]) is Finished:
+            if name == "black_white":
+                check_black_white(engine, game, events[-1].winner_id)
+            else:
+                check_double_pig(game, events[-1].winner_id, entries)
+            return game
+    raise InvariantError(f"хаос-партия {name} не закончилась")
+
+
+# 🏃 Прогон
+def run_batch(name, games, seed=None, chaos=False):
+    """Сыграть games партий одного движка; вернуть (партий, секунд)."""
+    rng = random.Random(seed)
+    engine = BlackWhiteEngine(rng) if name == "black_white" else DoublePigEngine(rng)
+    play = globals()[f"play_{name}"]
+    started = time.perf_counter()
+    for _ in range(games):
+        if chaos:
+            play_chaos(name, engine, rng)
+        else:
+            play(engine, rng)
+    return games, time.perf_counter() - started
+
+
+def _run_chunk(args):
+    return run_batch(*args)
+
+
+def run_parallel(name, games, processes, seed=None, chaos=False):
+    """Раскидать партии по процессам; время — по стене, а не сумма процессов."""
+    chunks = [(name, games // processes + (i < games % processes), None if seed is None else seed + i, chaos)
+              for i in range(processes)]
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        played = sum(n for n, _ in pool.map(_run_chunk, chunks))
+    return played, time.perf_counter() - started
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Пакетный прогон игровых движков без Telegram")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="движки через запятую")
+    parser.add_argument("--games", type=int, default=100_000, help="партий на движок")
+    parser.add_argument("--processes", type=int, default=1, help="число процессов (по умолчанию 1)")
+    parser.add_argument("--chaos", action="store_true", help="случайные действия случайных игроков")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    mode = "хаос" if args.chaos else "случайная игра"
+    print(f"Партий на движок: {args.games}, процессов: {args.processes}, режим: {mode}")
+    for name in args.engines.split(","):
+        if args.processes > 1:
+            played, elapsed = run_parallel(name, args.games, args.processes, args.seed, args.chaos)
+        else:
+            played, elapsed = run_batch(name, args.games, args.seed, args.chaos)
+        rate = played / elapsed if elapsed else 0.0
+        print(f"{name:12} {played} партий за {elapsed:.2f} с: {rate:,.0f} партий/с, {rate * 60:,.0f} партий/мин")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,131 @@
+# benchmarks/bench_memory.py
+#
+# Байт на активную игру: старые вложенные dict против слотовых моделей (models.py).
+# Запуск: python benchmarks/bench_memory.py
+
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from models import (BlackWhiteGame, BlackWhitePlayer, DicePool, DoublePigGame, DoublePigPlayer, PigHold,
+                    PigRoll, Throw)
+
+GAMES = 500
+ROUNDS = 6
+DICE = 8
+PIG_ROLLS_PER_PLAYER = 40
+DICE_EMOJI = {1: "⚀", 2: "⚁", 3: "⚂", 4: "⚃", 5: "⚄", 6: "⚅"}
+
+
+def _draws(n_players, rng):
+    # Как в _handle_draw: 2 игрока делят пул пополам, иначе каждый тянет до 2 кубиков
+    pool = DicePool.full(DICE)
+    for i in range(n_players):
+        if n_players == 2:
+            yield pool.draw(DICE // 2, rng) if i == 0 else pool.take_all()
+        else:
+            if not len(pool):
+                pool.refill(DICE)
+            yield pool.draw(min(2, len(pool)), rng)
+
+
+# --- Старое представление (как до перехода на models.py) ---
+def legacy_black_white(n_players, rng):
+    players = {uid: {"username": f"player_{uid}", "white_total": 0, "black_total": 0, "score": 0,
+                     "has_played_this_round": False, "last_roll": None, "history": [], "pending_draw": None}
+               for uid in range(1, n_players + 1)}
+    game = {"players": players, "rounds_total": ROUNDS, "dice_count": DICE, "current_round": ROUNDS,
+            "main_message_id": 1, "current_player": 1, "turn_order": list(players), "phase": "playing",
+            "round_history": {i: [] for i in range(1, ROUNDS + 1)}, "round_dice_pool": [],
+            "pending_draw": None}
+    for rnd in range(1, ROUNDS + 1):
+        for uid, (w, b) in zip(players, _draws(n_players, rng)):
+            chosen = ["white"] * w + ["black"] * b
+            values = [rng.randint(1, 6) for _ in chosen]
+            result = sum(v if c == "white" else -v for v, c in zip(values, chosen))
+            p = players[uid]
+            p["last_roll"] = {"dice": chosen, "values": values, "result": result}
+            p["history"] = p["history"] + [result]
+            game["round_history"][rnd].append({"player": p["username"], "dice": chosen, "values": values,
+                                               "result": result})
+    game["round_dice_pool"] = ["white"] * (DICE // 2) + ["black"] * (DICE // 2)
+    return game
+
+
+def legacy_double_pig(n_players, rng):
+    players = {uid: {"username": f"player_{uid}", "total": 0, "turn_points": 0, "history": [], "must_roll": False}
+               for uid in range(1, n_players + 1)}
+    game = {"players": players, "phase": "playing", "main_message_id": 1, "target_score": 150,
+            "turn_order": list(players), "current_player": 1, "round_index": 1, "history": []}
+    for uid, p in players.items():
+        for _ in range(PIG_ROLLS_PER_PLAYER):
+            d1, d2 = rng.randint(1, 6), rng.randint(1, 6)
+            entry = {"player": p["username"], "user_id": uid, "dice": (d1, d2),
+                     "dice_emojis": f"{DICE_EMOJI[d1]} {DICE_EMOJI[d2]}", "sum": d1 + d2, "note": f"+{d1 + d2}"}
+            p["history"].append(entry)
+            game["history"].append(entry)
+        hold = {"player": p["username"], "user_id": uid, "action": "hold", "added": 10, "note": "Сохранено +10"}
+        p["history"].append(hold)
+        game["history"].append(hold)
+    return game
+
+
+# --- Новое представление ---
+def model_black_white(n_players, rng):
+    game = BlackWhiteGame(rounds_total=ROUNDS, dice_count=DICE, current_round=ROUNDS, main_message_id=1,
+                          current_player=1, phase="playing", round_history=[[] for _ in range(ROUNDS)])
+    for uid in range(1, n_players + 1):
+        game.players[uid] = BlackWhitePlayer(f"player_{uid}")
+    game.turn_order = list(game.players)
+    for rnd in range(ROUNDS):
+        for uid, (w, b) in zip(game.players, _draws(n_players, rng)):
+            throw = Throw(uid, tuple(rng.randint(1, 6) for _ in range(w)), tuple(rng.randint(1, 6) for _ in range(b)))
+            p = game.players[uid]
+            p.white_total += sum(throw.whites)
+            p.black_total += sum(throw.blacks)
+            p.last_roll = throw
+            game.round_history[rnd].append(throw)
+    game.pool.refill(DICE)
+    return game
+
+
+def model_double_pig(n_players, rng):
+    game = DoublePigGame(target_score=150, main_message_id=1, current_player=1, phase="playing")
+    for uid in range(1, n_players + 1):
+        game.players[uid] = DoublePigPlayer(f"player_{uid}")
+    game.turn_order = list(game.players)
+    for uid in game.players:
+        for _ in range(PIG_ROLLS_PER_PLAYER):
+            game.history.append(PigRoll(uid, rng.randint(1, 6), rng.randint(1, 6)))
+        game.history.append(PigHold(uid, 10))
+    return game
+
+
+def bytes_per_game(factory, n_players):
+    rng = random.Random(42)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [factory(n_players, rng) for _ in range(GAMES)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) / GAMES
+
+
+def main():
+    print(f"Байт на активную игру ({GAMES} игр; ЧБ: {ROUNDS} раундов, {DICE} кубиков; "
+          f"свинка: {PIG_ROLLS_PER_PLAYER} бросков на игрока)")
+    print(f"{'игра':<14}{'игроков':>8}{'dict':>12}{'models':>12}{'экономия':>10}")
+    for title, legacy, model in (("Чёрные-Белые", legacy_black_white, model_black_white),
+                                 ("Свинка", legacy_double_pig, model_double_pig)):
+        for n_players in (2, 4, 8):
+            old = bytes_per_game(legacy, n_players)
+            new = bytes_per_game(model, n_players)
+            print(f"{title:<14}{n_players:>8}{old:>12.0f}{new:>12.0f}{1 - new / old:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_metrics.py
+#
+# Цена записи метрики на горячем пути (metrics.py): наносекунды на inc/observe и
+# выделения памяти после первой записи в серию.
+# Запуск: python benchmarks/bench_metrics.py
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from metrics import MetricsRegistry
+
+N = 1_000_000
+
+
+def per_call_ns(fn, arg):
+    started = time.perf_counter()
+    for _ in range(N):
+        fn(arg)
+    return (time.perf_counter() - started) / N * 1e9
+
+
+def allocated_bytes(fn, arg):
+    fn(arg)     # первая запись создаёт серию
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(10_000):
+        fn(arg)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before
+
+
+def main():
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "bench", ("method",)).labels("editMessageText")
+    histogram = registry.histogram("bench_seconds", "bench", ("handler",)).labels("button_handler")
+    print(f"{'запись':<22}{'нс':>8}{'байт после первой':>20}")
+    for title, fn, arg in (("counter.inc(1)", counter.inc, 1),
+                           ("histogram.observe()", histogram.observe, 0.0042)):
+        print(f"{title:<22}{per_call_ns(fn, arg):>8.0f}{allocated_bytes(fn, arg):>20}")
+    started = time.perf_counter()
+    text = registry.render()
+    print(f"render(): {(time.perf_counter() - started) * 1e6:.0f} мкс, {len(text)} байт")
+
+
+if __name__ == "__main__":
+    main()
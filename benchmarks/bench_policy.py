@@ -0,0 +1,67 @@
+# benchmarks/bench_policy.py
+#
+# Бот «Двойной свинки»: сколько стоит посчитать таблицы стратегии (офлайн, pig_policy.py),
+# открыть их при старте (mmap) и принять одно решение во время хода.
+# Запуск: python benchmarks/bench_policy.py [--solve 50,100,150]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pig_policy import load_policies, policy_path, save, solve
+
+LOADS = 200
+LOOKUPS = 200_000
+
+
+def bench_solve(targets):
+    print(f"{'цель':>6}{'итераций':>10}{'расчёт, с':>11}{'файл, КБ':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for target in targets:
+            started = time.perf_counter()
+            _, roll, iterations = solve(target)
+            elapsed = time.perf_counter() - started
+            path = policy_path(target, tmp)
+            save(path, target, roll)
+            print(f"{target:>6}{iterations:>10}{elapsed:>11.1f}{os.path.getsize(path) / 1024:>10.1f}")
+
+
+def bench_load():
+    started = time.perf_counter()
+    for _ in range(LOADS):
+        for policy in load_policies().values():
+            policy.close()
+    per_load = (time.perf_counter() - started) / LOADS * 1000
+    print(f"Открытие всех таблиц (load_policies): {per_load:.3f} мс")
+
+
+def bench_lookup():
+    rng = random.Random(1)
+    print(f"{'цель':>6}{'нс на решение':>15}")
+    for t, policy in sorted(load_policies().items()):
+        states = [(rng.randrange(t), rng.randrange(t), rng.randrange(1, t), False) for _ in range(LOOKUPS)]
+        should_roll = policy.should_roll
+        started = time.perf_counter()
+        for own, opponent, turn_points, must_roll in states:
+            should_roll(own, opponent, turn_points, must_roll)
+        print(f"{t:>6}{(time.perf_counter() - started) / LOOKUPS * 1e9:>15.0f}")
+        policy.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--solve", default="50,100", help="цели для замера расчёта ('' — не считать)")
+    args = parser.parse_args()
+    if args.solve:
+        bench_solve([int(t) for t in args.solve.split(",")])
+    bench_load()
+    bench_lookup()
+
+
+if __name__ == "__main__":
+    main()
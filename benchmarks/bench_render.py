@@ -0,0 +1,101 @@
+# benchmarks/bench_render.py
+#
+# Стоимость рендера табло «Чёрные-Белые»: полная пересборка истории на каждый клик
+# (как было) против инкрементального кэша (rendering.ThrowHistoryCache).
+# Запуск: python benchmarks/bench_render.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("GAME_STORE", "none")
+
+from black_white import _board_text
+from models import BlackWhiteGame, BlackWhitePlayer, DicePool, Throw
+from rendering import format_throw
+
+RENDERS_PER_THROW = 3   # табло перерисовывается 2-3 раза на бросок
+GAMES = 20
+
+
+def legacy_board_text(game):
+    """Рендер табло до кэширования: вся история собирается заново."""
+    current_player_name = game.players[game.current_player].username
+    history_lines = []
+    for rnd, throws in enumerate(game.round_history[:game.current_round], start=1):
+        if throws:
+            history_lines.append(f"\n*Раунд {rnd}:*")
+            for throw in throws:
+                history_lines.append(format_throw(game.players[throw.user_id].username, throw))
+    players_status = []
+    for pid, p in game.players.items():
+        status = "✅" if p.has_played_this_round else ("➡️" if pid == game.current_player else "⏳")
+        players_status.append(f"{status} {p.username}: ⚪{p.white_total} ⚫{p.black_total} ➡️ {p.score}")
+    return (
+        f"🎲 *Раунд {game.current_round} из {game.rounds_total}*\n"
+        f"Ход: {current_player_name}\n\n"
+        "Общий счёт:\n" + "\n".join(players_status) +
+        ("\n\n*История бросков:*" + "\n".join(history_lines) if history_lines else "")
+    )
+
+
+def play(render, n_players, rounds, dice_count, seed):
+    """Сыграть партию, вызывая render(game) после каждого броска; вернуть число рендеров."""
+    rng = random.Random(seed)
+    game = BlackWhiteGame(rounds_total=rounds, dice_count=dice_count, phase="playing",
+                          round_history=[[] for _ in range(rounds)])
+    for uid in range(1, n_players + 1):
+        game.players[uid] = BlackWhitePlayer(f"player_{uid}")
+    game.turn_order = list(game.players)
+    renders = 0
+    for rnd in range(1, rounds + 1):
+        game.current_round = rnd
+        pool = DicePool.full(dice_count)
+        for p in game.players.values():
+            p.has_played_this_round = False
+        for i, uid in enumerate(game.turn_order):
+            game.current_player = uid
+            if n_players == 2:
+                w, b = pool.draw(dice_count // 2, rng) if i == 0 else pool.take_all()
+            else:
+                if not len(pool):
+                    pool.refill(dice_count)
+                w, b = pool.draw(min(2, len(pool)), rng)
+            throw = Throw(uid, tuple(rng.randint(1, 6) for _ in range(w)), tuple(rng.randint(1, 6) for _ in range(b)))
+            p = game.players[uid]
+            p.white_total += sum(throw.whites)
+            p.black_total += sum(throw.blacks)
+            p.has_played_this_round = True
+            game.round_history[rnd - 1].append(throw)
+            for _ in range(RENDERS_PER_THROW):
+                render(game)
+                renders += 1
+    return renders
+
+
+def check_same_output():
+    texts = []
+    play(lambda g: texts.append((legacy_board_text(g), _board_text(g))), 8, 6, 8, seed=7)
+    assert all(old == new for old, new in texts), "рендеры расходятся"
+
+
+def measure(render, n_players, rounds, dice_count):
+    start = time.perf_counter()
+    renders = sum(play(render, n_players, rounds, dice_count, seed) for seed in range(GAMES))
+    return (time.perf_counter() - start) / renders * 1e6
+
+
+def main():
+    check_same_output()
+    print(f"Мкс на рендер табло (среднее за партию, {RENDERS_PER_THROW} рендера на бросок)")
+    print(f"{'игроков':>8}{'раундов':>9}{'полный':>10}{'кэш':>10}{'ускорение':>11}")
+    for n_players, rounds in ((2, 6), (4, 6), (8, 6)):
+        old = measure(legacy_board_text, n_players, rounds, 8)
+        new = measure(_board_text, n_players, rounds, 8)
+        print(f"{n_players:>8}{rounds:>9}{old:>10.1f}{new:>10.1f}{old / new:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_transport.py
+#
+# Профили HTTP-транспорта (transport.py) против подставного Bot API под параллельной
+# нагрузкой: всплески одновременных sendMessage с паузами между ними, как правки табло
+# после серии нажатий. Каждое новое соединение стоит --handshake секунд (TCP+TLS до
+# api.telegram.org). Показывает задержку вызова, новые соединения (переживают ли они
+# паузу) и насыщение пула.
+#
+# Сервер работает в том же процессе и event loop, поэтому заметна и цена самого клиента:
+# httpcore перебирает все соединения пула на каждый запрос.
+# Запуск: python benchmarks/bench_transport.py [--bursts 4 --size 20 --gap 6 --latency 0.05 --handshake 0.1]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from telegram import Bot
+
+from fake_bot_api import FAKE_TOKEN, FakeBotAPI
+from transport import HTTP_POOL_TIMEOUTS, HTTP_POOL_WAITS, PROFILES, build_request
+
+
+def variants():
+    ptb, tuned = PROFILES["ptb"], PROFILES["tuned"]
+    yield "ptb", dict(ptb)
+    yield "tuned", dict(tuned)
+    # По одному отличию от ptb: только размер пула и только keep-alive
+    yield f"ptb, пул {tuned['pool_size']}", dict(ptb, pool_size=tuned["pool_size"])
+    yield f"tuned, пул {ptb['pool_size']}", dict(tuned, pool_size=ptb["pool_size"])
+
+
+async def run_variant(api, name, settings, bursts, size, gap):
+    request = build_request(name, settings=settings)
+    latencies, failed = [], 0
+    connections = api.connections
+
+    async def call(chat_id):
+        nonlocal failed
+        started = time.perf_counter()
+        try:
+            await bot.send_message(chat_id=chat_id, text="bench")
+        except Exception:
+            failed += 1
+            return
+        latencies.append(time.perf_counter() - started)
+
+    async with Bot(FAKE_TOKEN, base_url=api.base_url, request=request) as bot:
+        busy = 0.0
+        for burst in range(bursts):
+            if burst:
+                await asyncio.sleep(gap)
+            started = time.perf_counter()
+            await asyncio.gather(*(call(-1 - i) for i in range(size)))
+            busy += time.perf_counter() - started
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "calls/s": len(latencies) / busy,
+        "p50": pick(0.5),
+        "p95": pick(0.95),
+        "conns": api.connections - connections,
+        "waits": HTTP_POOL_WAITS.labels(name).value,
+        "timeouts": HTTP_POOL_TIMEOUTS.labels(name).value,
+        "failed": failed,
+    }
+
+
+async def main(bursts, size, gap, latency, handshake):
+    api = FakeBotAPI(token=FAKE_TOKEN, latency=latency, handshake=handshake)
+    await api.start()
+    try:
+        print(f"Всплесков: {bursts} по {size} вызовов, пауза {gap:g} с, задержка API {latency * 1000:.0f} мс, "
+              f"новое соединение {handshake * 1000:.0f} мс")
+        print(f"{'профиль':<20}{'вызовов/с':>11}{'p50, мс':>9}{'p95, мс':>9}{'TCP':>6}"
+              f"{'ждали пул':>11}{'pool timeout':>14}{'ошибок':>8}")
+        for name, settings in variants():
+            r = await run_variant(api, name, settings, bursts, size, gap)
+            print(f"{name:<20}{r['calls/s']:>11.0f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['conns']:>6}"
+                  f"{r['waits']:>11}{r['timeouts']:>14}{r['failed']:>8}")
+    finally:
+        await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Профили HTTP-транспорта против подставного Bot API")
+    parser.add_argument("--bursts", type=int, default=4)
+    parser.add_argument("--size", type=int, default=20, help="одновременных вызовов во всплеске")
+    parser.add_argument("--gap", type=float, default=6.0, help="пауза между всплесками, с (keep-alive ptb — 5 с)")
+    parser.add_argument("--latency", type=float, default=0.05, help="средняя задержка ответа API, с")
+    parser.add_argument("--handshake", type=float, default=0.1, help="цена нового соединения, с (0 — loopback)")
+    args = parser.parse_args()
+    asyncio.run(main(args.bursts, args.size, args.gap, args.latency, args.handshake))
@@ -0,0 +1,120 @@
+# chat_mailbox.py
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from telegram.ext import BaseUpdateProcessor
+
+from log_config import bind, unbind
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# 📬 Сколько апдейтов может ждать в почтовых ящиках и сколько чатов обрабатываются одновременно
+MAILBOX_LIMIT = int(os.getenv("MAILBOX_LIMIT", "4096"))
+MAILBOX_ACTIVE_CHATS = int(os.getenv("MAILBOX_ACTIVE_CHATS", "256"))
+
+
+def update_chat_key(update):
+    """Ключ почтового ящика: чат апдейта, иначе пользователь; None — без очереди."""
+    chat = getattr(update, "effective_chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(update, "effective_user", None)
+    return user.id if user is not None else None
+
+
+class ChatMailboxProcessor(BaseUpdateProcessor):
+    """Апдейты разных чатов обрабатываются параллельно, одного чата — строго по очереди.
+
+    У каждого чата с работой есть почтовый ящик (deque) и один task-обработчик, который
+    разбирает его и завершается, когда ящик пуст. Поэтому игровому коду не нужны свои
+    блокировки: два нажатия в одном чате никогда не выполняются одновременно, а медленный
+    обработчик (ожидание flood control, паузы) задерживает только свой чат.
+    max_concurrent_updates ограничивает число принятых, но ещё не обработанных апдейтов
+    (ожидающие держат слот — это и есть backpressure), active_chats — число одновременно
+    работающих обработчиков.
+
+    Здесь же начинается трасса апдейта (tracing.py): ожидание в ящике и сам обработчик
+    попадают в неё фазами "mailbox" и "handler".
+    """
+
+    def __init__(self, max_concurrent_updates=MAILBOX_LIMIT, active_chats=MAILBOX_ACTIVE_CHATS):
+        super().__init__(max_concurrent_updates)
+        self._active = asyncio.Semaphore(active_chats)
+        self._mailboxes = {}    # chat_id -> deque[(coroutine, future, trace, queued)]
+        self._workers = {}      # chat_id -> asyncio.Task
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        # Дорабатываем уже принятые апдейты, чтобы их результат попал в чекпоинт
+        if self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    async def do_process_update(self, update, coroutine):
+        key = update_chat_key(update)
+        trace = tracer.begin(update, key)
+        if key is None:
+            await self._run(coroutine, trace, key)
+            return
+        future = asyncio.get_running_loop().create_future()
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            mailbox = self._mailboxes[key] = deque()
+        mailbox.append((coroutine, future, trace, time.perf_counter()))
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key, mailbox))
+        # shield: отмена ожидающего не должна отменять обработку в ящике
+        await asyncio.shield(future)
+
+    async def _drain(self, key, mailbox):
+        try:
+            while mailbox:
+                coroutine, future, trace, queued = mailbox.popleft()
+                try:
+                    async with self._active:
+                        if trace is not None:
+                            trace.add("mailbox", queued, time.perf_counter())
+                        await self._run(coroutine, trace, key)
+                except Exception as e:
+                    logger.error(f"📬 Ошибка обработки апдейта чата {key}: {e}")
+                finally:
+                    if not future.done():
+                        future.set_result(None)
+        finally:
+            # Между проверкой пустого ящика и этим местом нет await — новый апдейт не потеряется
+            del self._mailboxes[key]
+            del self._workers[key]
+
+    @staticmethod
+    async def _run(coroutine, trace, key):
+        # Трасса и chat_id для логов видны обработчику и всему, что он вызывает
+        # (registry, EditScheduler, лимитер)
+        token = tracer.activate(trace)
+        log_token = bind(chat_id=key)
+        try:
+            if trace is None:
+                await coroutine
+                return
+            with tracer.span("handler"):
+                await coroutine
+        finally:
+            unbind(log_token)
+            tracer.deactivate(token)
+            if trace is not None:
+                trace.release()
+
+    def backlog(self, chat_id=None):
+        """Сколько апдейтов ждут обработки (в чате или всего)."""
+        if chat_id is not None:
+            return len(self._mailboxes.get(chat_id, ()))
+        return sum(len(m) for m in self._mailboxes.values())
+
+    @property
+    def active_chats(self):
+        return len(self._workers)
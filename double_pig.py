@@ -1,73 +1,49 @@
 # double_pig.py
 
 import logging
-import random
-import asyncio
-import time
-import re
+import os
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
+import registry
+from auto_delete import deleter
+from edit_scheduler import EditScheduler
+from engines import Busted, DoublePigEngine
+from event_log import log_double_pig
+from models import DoublePigGame, PigRoll
+from pig_policy import load_policies
+from rate_limit import PRIORITY_DEFAULT, PRIORITY_POPUP, PRIORITY_RESULT, PRIORITY_TURN, priority_args
+from storage import persistence
+from sweeper import sweeper
+
 logger = logging.getLogger(__name__)
 
 _games = {}
-_last_edit_time = {}
+_STORE_NAMESPACE = "double_pig"
+# Правила живут в движке (engines.py); здесь — только Telegram-обвязка
+_engine = DoublePigEngine()
+
+# 🤖 Бот-соперник: ходит по таблице оптимальной стратегии (pig_policy.py). Таблицы
+# отображаются в память при импорте; без них кнопка «Играть с ботом» не показывается.
+PIG_BOT = os.getenv("PIG_BOT", "1") == "1"
+BOT_PLAYER_ID = 0           # у настоящих пользователей Telegram id > 0
+BOT_NAME = "🤖 Свин-бот"
+_BOT_FALLBACK_THRESHOLD = 25
+_policies = load_policies() if PIG_BOT else {}
 DICE_EMOJI = {1: "⚀", 2: "⚁", 3: "⚂", 4: "⚃", 5: "⚄", 6: "⚅"}
 
+persistence.register(_STORE_NAMESPACE, _games)
 
-async def _auto_delete_message(context, chat_id, message_id, delay=8):
-    await asyncio.sleep(delay)
-    try:
-        await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-    except Exception:
-        pass
 
+# Темп правок задаёт общий TelegramRateLimiter бота (rate_limit.py)
+_edit_scheduler = EditScheduler(_STORE_NAMESPACE)
+sweeper.register(_STORE_NAMESPACE, _games, on_evict=_edit_scheduler.discard)
 
-async def _safe_edit_message(context, chat_id, message_id, text, reply_markup=None, parse_mode="Markdown"):
-    now = time.time()
-    last = _last_edit_time.get(chat_id, 0)
-    wait_min = 1.2
-    if now - last < wait_min:
-        await asyncio.sleep(wait_min - (now - last))
-    _last_edit_time[chat_id] = time.time()
 
-    try:
-        await context.bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=message_id,
-            text=text,
-            reply_markup=reply_markup,
-            parse_mode=parse_mode
-        )
-    except Exception as e:
-        err = str(e)
-        if "Message is not modified" in err:
-            logger.debug("safe_edit_message: no changes — skipped.")
-            return
-        if "Too Many Requests" in err or "Flood control" in err or "retry after" in err:
-            retry = 2
-            m = re.search(r"retry ?after\s*(\d+)", err, re.IGNORECASE)
-            if m:
-                try:
-                    retry = int(m.group(1)) + 1
-                except Exception:
-                    retry = 2
-            logger.warning(f"_safe_edit_message: Flood control ({err}). Ждём {retry}s и пробуем отправить новое сообщение.")
-            await asyncio.sleep(retry)
-            try:
-                msg = await context.bot.send_message(
-                    chat_id=chat_id, text=text, reply_markup=reply_markup, parse_mode=parse_mode
-                )
-                try:
-                    await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-                except Exception:
-                    pass
-                if chat_id in _games:
-                    _games[chat_id]["main_message_id"] = msg.message_id
-            except Exception as e2:
-                logger.error(f"_safe_edit_message: Повторная отправка не удалась: {e2}")
-        else:
-            logger.error(f"_safe_edit_message: Ошибка редактирования: {e}")
+async def _safe_edit_message(context, chat_id, message_id, text, reply_markup=None, parse_mode="Markdown",
+                             priority=PRIORITY_DEFAULT):
+    # Правка ставится в очередь чата и уходит в фоне; обработчик не ждёт лимитов
+    _edit_scheduler.submit(context.bot, chat_id, message_id, text, reply_markup, parse_mode, priority)
 
 
 async def _rules_message(chat_id, context):
@@ -84,75 +60,87 @@ async def _rules_message(chat_id, context):
         "▫️ Цель: первым достичь выбранного порога (50 / 100 / 150 очков)."
     )
     keyboard = [[InlineKeyboardButton("Я прочитал ✅", callback_data="dp_delete_rules")]]
-    await context.bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
+    await context.bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard),
+                                   **priority_args(context.bot, PRIORITY_POPUP))
 
 
 async def _update_lobby(chat_id, context):
     game = _games[chat_id]
-    players_list = list(game["players"].values())
-    players_text = "\n".join(f"👤 {p['username']}" for p in players_list) or "— Нет игроков —"
+    players_list = list(game.players.values())
+    players_text = "\n".join(f"👤 {p.username}" for p in players_list) or "— Нет игроков —"
 
     text = f"🎯 *Игра: Двойная свинка*\n\nИгроки ({len(players_list)}):\n{players_text}\n\n"
     if len(players_list) >= 2:
         text += "Выберите цель по очкам (первый достиг — побеждает):"
         keyboard = [
-            [
-                InlineKeyboardButton("50 очков", callback_data="dp_set_target_50"),
-                InlineKeyboardButton("100 очков", callback_data="dp_set_target_100"),
-                InlineKeyboardButton("150 очков", callback_data="dp_set_target_150"),
-            ],
+            [InlineKeyboardButton(f"{target} очков", callback_data=f"dp_set_target_{target}")
+             for target in _engine.TARGETS],
             [InlineKeyboardButton("📜 Правила", callback_data="dp_show_rules")],
         ]
     else:
         text += "Нужно минимум 2 игрока, максимум 4. Нажмите «Присоединиться 🎲» чтобы играть."
-        keyboard = [
-            [InlineKeyboardButton("Присоединиться 🎲", callback_data="dp_join")],
-            [InlineKeyboardButton("📜 Правила", callback_data="dp_show_rules")],
-        ]
+        keyboard = [[InlineKeyboardButton("Присоединиться 🎲", callback_data="dp_join")]]
+        if _policies and BOT_PLAYER_ID not in game.players:
+            keyboard.append([InlineKeyboardButton("Играть с ботом 🤖", callback_data="dp_add_bot")])
+        keyboard.append([InlineKeyboardButton("📜 Правила", callback_data="dp_show_rules")])
+
+    await _safe_edit_message(context, chat_id, game.main_message_id, text, InlineKeyboardMarkup(keyboard))
+
+
+def _roll_note(d1, d2):
+    if d1 == 1 and d2 == 1:
+        return "Две единицы — общий счёт обнулён 💥"
+    if d1 == 1 or d2 == 1:
+        return "Выпала единица — ход сгорел 🔴"
+    if d1 == d2:
+        return f"Дубль! Сумма удвоена → +{(d1 + d2) * 2} (обязан бросать ещё) 🔁"
+    return f"+{d1 + d2}"
+
 
-    await _safe_edit_message(context, chat_id, game["main_message_id"], text, InlineKeyboardMarkup(keyboard))
+def _format_entry(game, entry):
+    username = game.players[entry.user_id].username
+    if isinstance(entry, PigRoll):
+        return f"👤 {username}: {DICE_EMOJI[entry.d1]} {DICE_EMOJI[entry.d2]} → {_roll_note(entry.d1, entry.d2)}"
+    return f"👤 {username}: сохранено +{entry.added}"
 
 
 async def _update_board(chat_id, context):
     game = _games[chat_id]
-    if not game["turn_order"]:
+    if not game.turn_order:
         return
-    current_player_id = game["current_player"]
-    current_player_name = _games[chat_id]["players"][current_player_id]["username"]
+    current_player_id = game.current_player
+    current_player_name = game.players[current_player_id].username
 
     lines = []
-    for uid, p in game["players"].items():
-        tp = p.get("turn_points", 0)
+    for uid, p in game.players.items():
         marker = "➡️" if uid == current_player_id else "⏳"
-        line = f"{marker} {p['username']}: {p['total']} (текущий ход +{tp})"
+        line = f"{marker} {p.username}: {p.total} (текущий ход +{p.turn_points})"
         lines.append(line)
 
-    # Сокращаем историю до последних 6 записей
-    recent = game.get("history", [])[-6:]
+    # История — кольцевой буфер последних PIG_HISTORY_SIZE записей
+    recent = game.history
     hist_lines = []
     if recent:
         hist_lines.append("*Последние броски / действия:*")
         for entry in recent:
-            if entry.get("dice"):
-                emojis = entry.get("dice_emojis", "")
-                note = entry.get("note", "")
-                hist_lines.append(f"👤 {entry['player']}: {emojis} → {note}")
-            elif entry.get("action") == "hold":
-                hist_lines.append(f"👤 {entry['player']}: сохранено +{entry['added']}")
-            else:
-                hist_lines.append(f"👤 {entry.get('player')}: {entry.get('note','')}")
+            hist_lines.append(_format_entry(game, entry))
+
+    # Разовые пометки переходов (например, «ход сгорел») показываются в этом же рендере
+    note = "".join(f"💥 {line}\n" for line in game.note.split("\n")) + "\n" if game.note else ""
+    game.note = None
 
     # Убираем лишний отступ - объединяем всё в один блок
     text = (
-        f"🎲 *Двойная свинка* — цель: *{game['target_score']}* очков\n"
-        f"Раунд {game.get('round_index',1)}\n\n"
+        f"🎲 *Двойная свинка* — цель: *{game.target_score}* очков\n"
+        f"Раунд {game.round_index}\n\n"
+        + note +
         f"*Ход: {current_player_name}*\n\n"
         "*Счёт игроков:*\n" + "\n".join(lines) +
         ("\n" + "\n".join(hist_lines) if hist_lines else "")  # Убрали лишний \n\n
     )
 
-    current_player = game["players"][current_player_id]
-    if current_player.get("must_roll", False):
+    current_player = game.players[current_player_id]
+    if current_player.must_roll:
         keyboard = [
             [InlineKeyboardButton("Бросить 🎲", callback_data="dp_roll")],
             [InlineKeyboardButton("📜 Правила", callback_data="dp_show_rules")],
@@ -164,36 +152,29 @@ async def _update_board(chat_id, context):
             [InlineKeyboardButton("📜 Правила", callback_data="dp_show_rules")],
         ]
 
-    await _safe_edit_message(context, chat_id, game["main_message_id"], text, InlineKeyboardMarkup(keyboard))
+    await _safe_edit_message(context, chat_id, game.main_message_id, text, InlineKeyboardMarkup(keyboard),
+                             priority=PRIORITY_TURN)
 
 
 async def _show_final_results(chat_id, context, winner_id=None):
     game = _games[chat_id]
-    players = list(game["players"].items())
-    players.sort(key=lambda p: p[1]["total"], reverse=True)
+    players = list(game.players.items())
+    players.sort(key=lambda p: p[1].total, reverse=True)
 
     # Сокращаем историю до последних 8 записей в финале
-    recent = game.get("history", [])[-6:]
+    recent = game.history
     history_lines = []
     if recent:
         history_lines.append("*Последние броски / действия:*")
         for entry in recent:
-            if entry.get("dice"):
-                emojis = entry.get("dice_emojis", "")
-                note = entry.get("note", "")
-                history_lines.append(f"👤 {entry['player']}: {emojis} → {note}")
-            elif entry.get("action") == "hold":
-                history_lines.append(f"👤 {entry['player']}: сохранено +{entry['added']}")
-            else:
-                history_lines.append(f"👤 {entry.get('player')}: {entry.get('note','')}")
+            history_lines.append(_format_entry(game, entry))
 
     table_lines = []
     for i, (uid, p) in enumerate(players):
-        pts = p["total"]
         medal = ["🥇", "🥈", "🥉"][i] if i < 3 else ""
-        table_lines.append(f"{medal} {p['username']}: {pts}")
+        table_lines.append(f"{medal} {p.username}: {p.total}")
 
-    winner_name = game["players"][winner_id]["username"] if winner_id else players[0][1]["username"]
+    winner_name = game.players[winner_id].username if winner_id else players[0][1].username
     text = (
         "🏆 *ФИНАЛ - Двойная свинка* 🏆\n\n"
         + ("\n".join(history_lines) + "\n\n" if history_lines else "")
@@ -207,49 +188,32 @@ async def _show_final_results(chat_id, context, winner_id=None):
         [InlineKeyboardButton("📜 Правила", callback_data="dp_show_rules")],
     ]
 
-    try:
-        await _safe_edit_message(context, chat_id, game["main_message_id"], text, InlineKeyboardMarkup(keyboard))
-    except Exception as e:
-        logger.error(f"Не удалось обновить финальное сообщение: {e}")
-        msg = await context.bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown",
-                                             reply_markup=InlineKeyboardMarkup(keyboard))
-        _games[chat_id]["main_message_id"] = msg.message_id
-
-    game["phase"] = "finished"
+    await _safe_edit_message(context, chat_id, game.main_message_id, text, InlineKeyboardMarkup(keyboard),
+                             priority=PRIORITY_RESULT)
 
 
-async def _advance_turn(chat_id, context):
-    game = _games[chat_id]
-    if not game["turn_order"]:
-        return
-    game["turn_order"].append(game["turn_order"].pop(0))
-    game["current_player"] = game["turn_order"][0]
-    new_player = game["players"][game["current_player"]]
-    new_player["turn_points"] = new_player.get("turn_points", 0)
-    new_player["must_roll"] = new_player.get("must_roll", False)
-    await _update_board(chat_id, context)
+async def _render(chat_id, context):
+    # Один рендер на переход: что показывать, определяет фаза игры
+    phase = _games[chat_id].phase
+    if phase == "lobby":
+        await _update_lobby(chat_id, context)
+    elif phase == "playing":
+        await _update_board(chat_id, context)
+    elif phase == "finished":
+        await _show_final_results(chat_id, context)
 
 
 async def start_double_pig(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    if chat_id in _games and _games[chat_id]["phase"] != "finished":
+    if await persistence.restore(_STORE_NAMESPACE, chat_id) and _games[chat_id].phase != "finished":
         msg = await context.bot.send_message(
             chat_id=chat_id,
             text="Игра уже идёт! /stop чтобы завершить."
         )
-        asyncio.create_task(_auto_delete_message(context, chat_id, msg.message_id))
+        deleter.schedule(chat_id, msg.message_id)
         return
 
-    _games[chat_id] = {
-        "players": {},
-        "phase": "lobby",
-        "main_message_id": None,
-        "target_score": None,
-        "turn_order": [],
-        "current_player": None,
-        "round_index": 1,
-        "history": [],
-    }
+    _games[chat_id] = DoublePigGame()
 
     keyboard = [[InlineKeyboardButton("Присоединиться 🎲", callback_data="dp_join")]]
     msg = await context.bot.send_message(
@@ -258,212 +222,144 @@ async def start_double_pig(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=InlineKeyboardMarkup(keyboard),
         parse_mode="Markdown"
     )
-    _games[chat_id]["main_message_id"] = msg.message_id
+    _games[chat_id].main_message_id = msg.message_id
+    persistence.touch(_STORE_NAMESPACE, chat_id)
 
 
 async def stop_double_pig(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    if chat_id in _games:
-        del _games[chat_id]
+    if await persistence.restore(_STORE_NAMESPACE, chat_id):
+        game_module.close(chat_id)
         msg = await context.bot.send_message(
             chat_id=chat_id,
             text="🛑 Игра «Двойная свинка» завершена."
         )
-        asyncio.create_task(_auto_delete_message(context, chat_id, msg.message_id))
+        deleter.schedule(chat_id, msg.message_id)
     else:
         msg = await context.bot.send_message(
             chat_id=chat_id,
             text="Нет активной игры «Двойная свинка»."
         )
-        asyncio.create_task(_auto_delete_message(context, chat_id, msg.message_id))
+        deleter.schedule(chat_id, msg.message_id)
+
+
+def _on_close(chat_id, game):
+    _edit_scheduler.discard(chat_id)
 
 
 async def rules_double_pig(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await _rules_message(update.effective_chat.id, context)
 
 
-async def button_handler_double_pig(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    chat_id = query.message.chat.id
-    user_id = query.from_user.id
-    username = query.from_user.username or query.from_user.first_name
+# 🔘 Действия кнопок (callback_data "dp_<действие>[_<n>]", см. registry.py)
+game_module = registry.register(registry.GameModule(
+    key=_STORE_NAMESPACE,
+    title="Двойная свинка",
+    prefix="dp",
+    games=_games,
+    start=start_double_pig,
+    stop=stop_double_pig,
+    rules=rules_double_pig,
+    render=_render,
+    on_close=_on_close,
+))
+action = game_module.action
 
-    if query.data == "dp_delete_rules":
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=query.message.message_id)
-        except Exception as e:
-            logger.error(f"Ошибка удаления правил: {e}")
-        return
 
-    if chat_id not in _games:
-        await query.answer("Игра не найдена.", show_alert=True)
-        return
+@action("delete_rules", needs_game=False)
+async def _on_delete_rules(click):
+    try:
+        await click.context.bot.delete_message(chat_id=click.chat_id, message_id=click.query.message.message_id)
+    except Exception as e:
+        logger.error(f"Ошибка удаления правил: {e}")
 
-    game = _games[chat_id]
 
-    if query.data == "dp_switch_game":
-        if chat_id in _games:
-            del _games[chat_id]
-        keyboard = [
-            [InlineKeyboardButton("Чёрные-Белые", callback_data="select_game:black_white")],
-            [InlineKeyboardButton("Двойная свинка", callback_data="select_game:double_pig")],
-        ]
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text="🎲 *Выберите игру:*",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="Markdown"
-        )
-        await query.answer("Возврат к выбору игры", show_alert=False)
-        return
+@action("switch_game")
+async def _on_switch_game(click):
+    game_module.close(click.chat_id)
+    await click.context.bot.send_message(
+        chat_id=click.chat_id,
+        text="🎲 *Выберите игру:*",
+        reply_markup=registry.game_menu_markup(),
+        parse_mode="Markdown"
+    )
+    click.set_answer("Возврат к выбору игры")
 
-    if query.data == "dp_join":
-        if game["phase"] != "lobby":
-            await query.answer("Лобби закрыто!", show_alert=True)
-            return
-        if len(game["players"]) >= 4:
-            await query.answer("Максимум 4 игрока.", show_alert=True)
-            return
-        if user_id in game["players"]:
-            await query.answer("Ты уже в игре!", show_alert=True)
-            return
-        game["players"][user_id] = {
-            "username": username,
-            "total": 0,
-            "turn_points": 0,
-            "history": [],
-            "must_roll": False,
-        }
-        await _update_lobby(chat_id, context)
-        return
 
-    if query.data.startswith("dp_set_target_"):
-        if game["phase"] != "lobby":
-            await query.answer("Нельзя менять цель теперь.", show_alert=True)
-            return
-        target = int(query.data.split("_")[-1])
-        game["target_score"] = target
-        if len(game["players"]) < 2:
-            await query.answer("Нужно минимум 2 игрока.", show_alert=True)
-            return
-        game["phase"] = "playing"
-        game["turn_order"] = list(game["players"].keys())
-        random.shuffle(game["turn_order"])
-        game["current_player"] = game["turn_order"][0]
-        game["history"] = []
-        for p in game["players"].values():
-            p["turn_points"] = 0
-            p["must_roll"] = False
-            p["history"] = []
-        await _update_board(chat_id, context)
-        return
+@action("join")
+async def _on_join(click):
+    await registry.apply_events(click, _engine.join(click.game, click.user_id, click.username))
 
-    if query.data == "dp_show_rules":
-        await _rules_message(chat_id, context)
-        return
 
-    if query.data == "dp_roll":
-        if game["phase"] != "playing":
-            await query.answer("Игра не запущена.", show_alert=True)
-            return
-        if user_id != game["current_player"]:
-            await query.answer("⏳ Сейчас ход другого игрока!\nПодожди своей очереди 😉", show_alert=True)
-            return
-
-        d1, d2 = random.randint(1, 6), random.randint(1, 6)
-        dice_sum = d1 + d2
-        dice_emojis = f"{DICE_EMOJI[d1]} {DICE_EMOJI[d2]}"
-        player = game["players"][user_id]
-        log_entry = {"player": player["username"], "user_id": user_id, "dice": (d1, d2), "dice_emojis": dice_emojis, "sum": dice_sum}
-
-        if d1 == 1 and d2 == 1:
-            player["total"] = 0
-            player["turn_points"] = 0
-            player["must_roll"] = False
-            log_entry["note"] = "Две единицы — общий счёт обнулён 💥"
-            player["history"].append(log_entry)
-            game["history"].append(log_entry)
-            await _update_board(chat_id, context)
-            await asyncio.sleep(0.5)
-            await _advance_turn(chat_id, context)
-            return
-
-        if d1 == 1 or d2 == 1:
-            player["turn_points"] = 0
-            player["must_roll"] = False
-            log_entry["note"] = "Выпала единица — ход сгорел 🔴"
-            player["history"].append(log_entry)
-            game["history"].append(log_entry)
-            await _update_board(chat_id, context)
-            await asyncio.sleep(0.5)
-            await _advance_turn(chat_id, context)
-            return
-
-        if d1 == d2:
-            added = dice_sum * 2
-            player["turn_points"] += added
-            player["must_roll"] = True
-            log_entry["note"] = f"Дубль! Сумма удвоена → +{added} (обязан бросать ещё) 🔁"
-            player["history"].append(log_entry)
-            game["history"].append(log_entry)
-            await _update_board(chat_id, context)
-            return
-
-        player["turn_points"] += dice_sum
-        player["must_roll"] = False
-        log_entry["note"] = f"+{dice_sum}"
-        player["history"].append(log_entry)
-        game["history"].append(log_entry)
-        await _update_board(chat_id, context)
+@action("add_bot")
+async def _on_add_bot(click):
+    if not _policies:
         return
+    await registry.apply_events(click, _engine.join(click.game, BOT_PLAYER_ID, BOT_NAME))
+
 
-    if query.data == "dp_hold":
-        if game["phase"] != "playing":
-            await query.answer("Игра не запущена.", show_alert=True)
-            return
-        if user_id != game["current_player"]:
-            await query.answer("⏳ Сейчас ход другого игрока!\nПодожди своей очереди 😉", show_alert=True)
-            return
-
-        player = game["players"][user_id]
-        if player.get("must_roll", False):
-            await query.answer("После дубля нельзя остановиться — нужно бросать ещё! 🎲", show_alert=True)
-            return
-
-        added = player["turn_points"]
-        player["total"] += added
-        player["turn_points"] = 0
-        player["must_roll"] = False
-
-        hold_entry = {"player": player["username"], "user_id": user_id, "action": "hold", "added": added, "note": f"Сохранено +{added}"}
-        player["history"].append(hold_entry)
-        game["history"].append(hold_entry)
-
-        if player["total"] >= game["target_score"]:
-            await _show_final_results(chat_id, context, winner_id=user_id)
-            return
-
-        await _advance_turn(chat_id, context)
+@action("set_target")
+async def _on_set_target(click):
+    if not click.args:
         return
+    events = await registry.apply_events(click, _engine.set_target(click.game, click.args[0]))
+    log_double_pig(click.chat_id, click.game, events)
+    _play_bot_turns(click.chat_id, click.game)
 
-    if query.data == "dp_new_game":
-        _games[chat_id] = {
-            "players": {},
-            "phase": "lobby",
-            "main_message_id": game["main_message_id"],
-            "target_score": None,
-            "turn_order": [],
-            "current_player": None,
-            "round_index": 1,
-            "history": [],
-        }
-        keyboard = [[InlineKeyboardButton("Присоединиться 🎲", callback_data="dp_join")]]
-        text = "🎯 *Игра: Двойная свинка*\n\nЖдём игроков!\nМинимум 2 участника."
-        try:
-            await _safe_edit_message(context, chat_id, game["main_message_id"], text, InlineKeyboardMarkup(keyboard))
-        except Exception:
-            msg = await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
-            _games[chat_id]["main_message_id"] = msg.message_id
-        await query.answer("Новая игра создана!", show_alert=False)
-        return
\ No newline at end of file
+
+@action("show_rules")
+async def _on_show_rules(click):
+    await _rules_message(click.chat_id, click.context)
+
+
+def _note_bust(game, events):
+    # Ход сгорел (или обнулён счёт): пометка попадает в тот же рендер, что и смена хода
+    for event in events:
+        if isinstance(event, Busted):
+            roll = events[0]
+            line = f"{game.players[event.user_id].username}: {_roll_note(roll.d1, roll.d2)}"
+            game.note = f"{game.note}\n{line}" if game.note else line
+
+
+def _play_bot_turns(chat_id, game):
+    """Доиграть ходы бота сразу, в том же переходе: решение — поиск в таблице, без I/O.
+
+    Таблица посчитана для игры двоих, поэтому соперником считается лидер среди остальных.
+    """
+    policy = _policies.get(game.target_score)
+    while game.phase == "playing" and game.current_player == BOT_PLAYER_ID:
+        bot = game.players[BOT_PLAYER_ID]
+        if policy is not None:
+            leader = max(p.total for uid, p in game.players.items() if uid != BOT_PLAYER_ID)
+            roll = policy.should_roll(bot.total, leader, bot.turn_points, bot.must_roll)
+        else:
+            roll = bot.must_roll or bot.turn_points < _BOT_FALLBACK_THRESHOLD
+        events = _engine.roll(game, BOT_PLAYER_ID) if roll else _engine.hold(game, BOT_PLAYER_ID)
+        log_double_pig(chat_id, game, events)
+        _note_bust(game, events)
+        game.dirty = True
+
+
+@action("roll")
+async def _on_roll(click):
+    events = await registry.apply_events(click, _engine.roll(click.game, click.user_id))
+    log_double_pig(click.chat_id, click.game, events)
+    _note_bust(click.game, events)
+    _play_bot_turns(click.chat_id, click.game)
+
+
+@action("hold")
+async def _on_hold(click):
+    events = await registry.apply_events(click, _engine.hold(click.game, click.user_id))
+    log_double_pig(click.chat_id, click.game, events)
+    _play_bot_turns(click.chat_id, click.game)
+
+
+@action("new_game")
+async def _on_new_game(click):
+    chat_id, context, game = click.chat_id, click.context, click.game
+    _games[chat_id] = DoublePigGame(main_message_id=game.main_message_id)
+    keyboard = [[InlineKeyboardButton("Присоединиться 🎲", callback_data="dp_join")]]
+    text = "🎯 *Игра: Двойная свинка*\n\nЖдём игроков!\nМинимум 2 участника."
+    await _safe_edit_message(context, chat_id, game.main_message_id, text, InlineKeyboardMarkup(keyboard))
+    click.set_answer("Новая игра создана!")
@@ -0,0 +1,184 @@
+# edit_scheduler.py
+
+import asyncio
+import logging
+import time
+
+from telegram.error import RetryAfter
+
+from metrics import THROTTLE_SLEEP_SECONDS, metrics
+from log_config import bind
+from rate_limit import PRIORITY_DEFAULT, priority_args, retry_seconds
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+_EDIT_SLEEP = THROTTLE_SLEEP_SECONDS.labels("edit_queue")
+
+# 📊 Очереди правок по играм
+_schedulers = {}    # имя -> EditScheduler
+
+EDIT_QUEUE_DEPTH = metrics.gauge(
+    "bot_edit_queue_depth", "Правки, ждущие отправки",
+    lambda: {(name,): scheduler.pending_count() for name, scheduler in _schedulers.items()}, ("game",))
+EDITS_SKIPPED = metrics.counter(
+    "bot_edits_skipped_total", "Правки, не отправленные: на экране уже эта версия", ("game",))
+
+
+class EditScheduler:
+    """Исходящие правки сообщений: на каждый message_id хранится только последняя версия.
+
+    Обработчик кладёт нужный (text, reply_markup) и сразу возвращается, а отдельная
+    задача на каждый чат отправляет правки по одной: пока идёт (или ждёт лимита)
+    текущая правка, новые версии копятся, и отправляется только самая свежая.
+    min_interval задаёт дополнительный минимальный зазор между правками чата.
+
+    Из ждущих правок первой уходит самая приоритетная (rate_limit.PRIORITY_*), приоритет
+    передаётся и лимитеру. Если 429 дошёл до планировщика (лимитер исчерпал повторы),
+    правка возвращается в очередь, а чат молчит весь retry_after — в фоне, без нового
+    сообщения вместо старого.
+
+    Правка держит трассу апдейта, который её поставил (tracing.py): ожидание в очереди и
+    сам вызов попадают в ту же трассу. Вытесненная более свежей версией правка трассу
+    отпускает — пользователь увидит уже следующую.
+    """
+
+    def __init__(self, name, min_interval=0.0):
+        self.name = name
+        self.min_interval = min_interval
+        self._pending = {}      # chat_id -> {message_id: (priority, bot, text, reply_markup, parse_mode, trace, queued)}
+        self._last_edit = {}    # chat_id -> time.monotonic() последней правки
+        self._paused = {}       # chat_id -> time.monotonic(), до которого чат на паузе после 429
+        self._drivers = {}      # chat_id -> asyncio.Task
+        self._applied = {}      # chat_id -> {message_id: отпечаток последней применённой версии}
+        self._skipped = EDITS_SKIPPED.labels(name)
+        _schedulers[name] = self
+
+    def submit(self, bot, chat_id, message_id, text, reply_markup=None, parse_mode="Markdown",
+               priority=PRIORITY_DEFAULT):
+        pending = self._pending.get(chat_id)
+        if self._is_applied(chat_id, message_id, text, reply_markup, parse_mode):
+            # На экране уже именно это — устаревшая неотправленная версия тоже не нужна
+            self._skipped.inc()
+            if pending:
+                self._release(pending.pop(message_id, None))
+            return
+        trace = tracer.current()
+        if trace is not None:
+            trace.hold()
+        # Новая версия заменяет ещё не отправленную, сохраняя её место в очереди
+        pending = self._pending.setdefault(chat_id, {})
+        self._release(pending.get(message_id))
+        pending[message_id] = (priority, bot, text, reply_markup, parse_mode, trace, time.perf_counter())
+        if chat_id not in self._drivers:
+            self._drivers[chat_id] = asyncio.create_task(self._drive(chat_id))
+
+    def discard(self, chat_id):
+        """Забыть неотправленные правки и отпечатки чата (после /stop или выселения игры)."""
+        for entry in self._pending.pop(chat_id, {}).values():
+            self._release(entry)
+        self._applied.pop(chat_id, None)
+        self._last_edit.pop(chat_id, None)
+        self._paused.pop(chat_id, None)
+
+    def _forget_message(self, chat_id, message_id):
+        """Сообщение заменено или удалено — его отпечаток больше не актуален."""
+        applied = self._applied.get(chat_id)
+        if applied:
+            applied.pop(message_id, None)
+
+    @staticmethod
+    def _release(entry):
+        # Правка покинула очередь, не дойдя до отправки: её трасса больше не ждёт
+        if entry is not None and entry[5] is not None:
+            entry[5].release()
+
+    @staticmethod
+    def _fingerprint(text, reply_markup, parse_mode):
+        # InlineKeyboardMarkup хешируется по содержимому кнопок
+        return hash((text, reply_markup, parse_mode))
+
+    def _is_applied(self, chat_id, message_id, text, reply_markup, parse_mode):
+        applied = self._applied.get(chat_id)
+        return bool(applied) and applied.get(message_id) == self._fingerprint(text, reply_markup, parse_mode)
+
+    def _remember(self, chat_id, message_id, text, reply_markup, parse_mode):
+        self._applied.setdefault(chat_id, {})[message_id] = self._fingerprint(text, reply_markup, parse_mode)
+
+    def pending_count(self, chat_id=None):
+        """Сколько правок ждут отправки (в чате или всего); экспортируется в bot_edit_queue_depth."""
+        if chat_id is not None:
+            return len(self._pending.get(chat_id, ()))
+        return sum(len(p) for p in self._pending.values())
+
+    async def _drive(self, chat_id):
+        # Контекст задачи свой (копия создателя) — поля логов без чужих game/action
+        bind(chat_id=chat_id)
+        try:
+            while self._pending.get(chat_id):
+                now = time.monotonic()
+                wait = max(self._last_edit.get(chat_id, 0) + self.min_interval,
+                           self._paused.get(chat_id, 0)) - now
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    _EDIT_SLEEP.inc(wait)
+                pending = self._pending.get(chat_id)
+                if not pending:
+                    break
+                # Самая приоритетная правка; при равных — та, что раньше встала в очередь
+                message_id = min(pending, key=lambda mid: pending[mid][0])
+                priority, bot, text, reply_markup, parse_mode, trace, queued = pending.pop(message_id)
+                self._last_edit[chat_id] = time.monotonic()
+                if trace is not None:
+                    trace.add("edit_queue", queued, time.perf_counter())
+                # Задача могла унаследовать чужую трассу от создателя — ставим трассу правки
+                token = tracer.activate(trace)
+                try:
+                    requeued = await self._apply(bot, chat_id, message_id, text, reply_markup, parse_mode,
+                                                 priority, trace)
+                finally:
+                    tracer.deactivate(token)
+                if trace is not None and not requeued:
+                    trace.release()
+        except Exception as e:
+            logger.error(f"edit_scheduler: Ошибка в очереди правок чата {chat_id}: {e}")
+        finally:
+            self._drivers.pop(chat_id, None)
+            self._paused.pop(chat_id, None)
+            if not self._pending.get(chat_id):
+                self._pending.pop(chat_id, None)
+
+    async def _apply(self, bot, chat_id, message_id, text, reply_markup, parse_mode, priority=PRIORITY_DEFAULT,
+                     trace=None):
+        """-> True, если правка вернулась в очередь после 429 (трасса остаётся у неё)."""
+        if self._is_applied(chat_id, message_id, text, reply_markup, parse_mode):
+            self._skipped.inc()
+            return False
+        # Пока правка в полёте, состояние на экране неизвестно — новые версии не отсекаем
+        self._forget_message(chat_id, message_id)
+        try:
+            await bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+                **priority_args(bot, priority),
+            )
+            self._remember(chat_id, message_id, text, reply_markup, parse_mode)
+        except RetryAfter as e:
+            pause = retry_seconds(e)
+            logger.warning(f"edit_scheduler: Flood control в чате {chat_id}, правки на паузе {pause:g}s")
+            self._paused[chat_id] = time.monotonic() + pause
+            # Повтор — если за это время не пришла более свежая версия того же сообщения
+            pending = self._pending.setdefault(chat_id, {})
+            if message_id not in pending:
+                pending[message_id] = (priority, bot, text, reply_markup, parse_mode, trace, time.perf_counter())
+                return True
+        except Exception as e:
+            if "Message is not modified" in str(e):
+                logger.debug("edit_scheduler: no changes — skipped.")
+                self._remember(chat_id, message_id, text, reply_markup, parse_mode)
+                return False
+            logger.error(f"edit_scheduler: Ошибка редактирования сообщения: {e}")
+        return False
@@ -0,0 +1,317 @@
+# engines.py
+
+import random
+from dataclasses import dataclass
+
+from models import BlackWhitePlayer, DoublePigPlayer, PigHold, PigRoll, Throw
+
+
+# 📣 События движков. Броски (Throw, PigRoll, PigHold из models.py) тоже идут событиями.
+@dataclass(slots=True, frozen=True)
+class Rejected:
+    """Действие отклонено, состояние не изменилось."""
+    text: str
+
+
+@dataclass(slots=True, frozen=True)
+class Notice:
+    """Сообщение нажавшему игроку (alert=True — всплывающее окно)."""
+    text: str
+    alert: bool = False
+
+
+@dataclass(slots=True, frozen=True)
+class Joined:
+    user_id: int
+
+
+@dataclass(slots=True, frozen=True)
+class Configured:
+    setting: str
+    value: int
+
+
+@dataclass(slots=True, frozen=True)
+class Started:
+    first_player: int
+
+
+@dataclass(slots=True, frozen=True)
+class Drew:
+    user_id: int
+    white: int
+    black: int
+
+
+@dataclass(slots=True, frozen=True)
+class PoolRefilled:
+    pass
+
+
+@dataclass(slots=True, frozen=True)
+class RoundStarted:
+    round: int
+
+
+@dataclass(slots=True, frozen=True)
+class TurnPassed:
+    user_id: int
+
+
+@dataclass(slots=True, frozen=True)
+class Busted:
+    user_id: int
+    total_lost: bool    # две единицы — обнулён весь счёт
+
+
+@dataclass(slots=True, frozen=True)
+class Finished:
+    winner_id: int
+
+
+def is_rejected(events):
+    return len(events) == 1 and type(events[0]) is Rejected
+
+
+class BlackWhiteEngine:
+    """Правила «Чёрные-Белые» без Telegram: метод получает состояние (BlackWhiteGame)
+    и действие, меняет состояние и возвращает список событий. Синхронно и без I/O;
+    случайность — только через rng, поэтому партии воспроизводимы по seed.
+    """
+
+    ROUNDS = range(2, 21)
+    DICE = (4, 6, 8)
+
+    def __init__(self, rng=random):
+        self.rng = rng
+
+    def join(self, game, user_id, username):
+        if game.phase != "lobby":
+            return [Rejected("Лобби закрыто!")]
+        if user_id in game.players:
+            return [Rejected("Ты уже в игре!")]
+        game.players[user_id] = BlackWhitePlayer(username)
+        return [Joined(user_id), Notice(f"✅ {username} присоединился!")]
+
+    def set_rounds(self, game, rounds):
+        if game.phase != "lobby":
+            return [Rejected("Нельзя выбрать раунды сейчас!")]
+        if len(game.players) < 2:
+            return [Rejected("Нужно минимум 2 игрока.")]
+        if rounds not in self.ROUNDS:
+            return [Rejected("Выберите корректное количество раундов!")]
+        game.rounds_total = rounds
+        game.phase = "choose_dice"
+        return [Configured("rounds_total", rounds)]
+
+    def set_dice(self, game, dice_count):
+        if game.phase != "choose_dice":
+            return [Rejected("Сначала выберите количество раундов!")]
+        if dice_count not in self.DICE:
+            return [Rejected("Недопустимый формат!")]
+        game.dice_count = dice_count
+        game.phase = "playing"
+        game.turn_order = list(game.players.keys())
+        self.rng.shuffle(game.turn_order)
+        game.current_player = game.turn_order[0]
+        game.current_round = 1
+        game.round_history = [[] for _ in range(game.rounds_total)]
+        self._start_round(game)
+        return [Configured("dice_count", dice_count), Started(game.current_player), RoundStarted(1)]
+
+    @staticmethod
+    def _start_round(game):
+        for p in game.players.values():
+            p.has_played_this_round = False
+            p.last_roll = None
+            p.pending_draw = None
+        game.pool.refill(game.dice_count)
+
+    @staticmethod
+    def _check_turn(game, user_id):
+        if game.phase != "playing":
+            return [Rejected("Игра не запущена.")]
+        if user_id != game.current_player:
+            return [Rejected("❌ Сейчас не твой ход!")]
+        if game.players[user_id].has_played_this_round:
+            return [Rejected("Ты уже сделал ход!")]
+        return None
+
+    @staticmethod
+    def draw_plan(game):
+        """Что вытянет текущий игрок: (белых в коробке, чёрных в коробке, сколько тянуть).
+
+        Вдвоём первый тянет половину кубиков, второй забирает остаток; при 3+ игроках
+        каждый тянет по 2, а опустевшая коробка досыпается.
+        """
+        pool = game.pool
+        if len(game.turn_order) == 2:
+            if not any(p.has_played_this_round for p in game.players.values()):
+                return pool.white, pool.black, game.dice_count // 2
+            return pool.white, pool.black, len(pool)
+        if not len(pool):
+            half = game.dice_count // 2
+            return half, half, min(2, game.dice_count)
+        return pool.white, pool.black, min(2, len(pool))
+
+    def draw(self, game, user_id):
+        rejected = self._check_turn(game, user_id)
+        if rejected:
+            return rejected
+        player = game.players[user_id]
+        if player.pending_draw:
+            return [Rejected("Кубики уже вытянуты — нажми 'Бросить кубики' 🎯")]
+        pool = game.pool
+
+        if len(game.turn_order) > 2 and not len(pool):
+            # Коробка опустела раньше, чем все сходили: досыпаем кубики, отметки «уже
+            # бросил» не трогаем (иначе при 3+ игроках раунд никогда не закончится)
+            pool.refill(game.dice_count)
+        _, _, count = self.draw_plan(game)
+        if count > len(pool):
+            pool.refill(game.dice_count)
+            return [PoolRefilled(), Notice("Ошибка состояния: перезапуск раунда.", alert=True)]
+        player.pending_draw = chosen = pool.take_all() if count == len(pool) else pool.draw(count, self.rng)
+        return [Drew(user_id, *chosen), Notice("Кубики вытянуты — нажми 'Бросить кубики' 🎯")]
+
+    def roll(self, game, user_id):
+        rejected = self._check_turn(game, user_id)
+        if rejected:
+            return rejected
+        player = game.players[user_id]
+        if not player.pending_draw:
+            return [Rejected("Сначала вытяни кубики!")]
+
+        white_count, black_count = player.pending_draw
+        player.pending_draw = None
+        randint = self.rng.randint
+        throw = Throw(
+            user_id,
+            tuple(randint(1, 6) for _ in range(white_count)),
+            tuple(randint(1, 6) for _ in range(black_count)),
+        )
+        player.white_total += sum(throw.whites)
+        player.black_total += sum(throw.blacks)
+        player.has_played_this_round = True
+        player.last_roll = throw
+        game.round_history[game.current_round - 1].append(throw)
+        events = [throw]
+
+        if not all(p.has_played_this_round for p in game.players.values()):
+            order = game.turn_order
+            game.current_player = order[(order.index(user_id) + 1) % len(order)]
+            events.append(TurnPassed(game.current_player))
+        elif game.current_round >= game.rounds_total:
+            game.phase = "finished"
+            events.append(Finished(self.winner(game)))
+        else:
+            game.current_round += 1
+            game.turn_order.append(game.turn_order.pop(0))
+            game.current_player = game.turn_order[0]
+            self._start_round(game)
+            events += (RoundStarted(game.current_round), TurnPassed(game.current_player))
+        return events
+
+    @staticmethod
+    def winner(game):
+        return max(game.players, key=lambda uid: (game.players[uid].score, game.players[uid].white_total))
+
+
+class DoublePigEngine:
+    """Правила «Двойной свинки» без Telegram (тот же контракт, что у BlackWhiteEngine)."""
+
+    # Константы правил; их же читает векторный симулятор (pig_sim.py)
+    MAX_PLAYERS = 4
+    TARGETS = (50, 100, 150)    # цели, которые предлагает лобби
+    FACES = 6
+    BUST_FACE = 1               # одна такая грань сжигает очки хода, две — весь счёт
+    DOUBLE_MULTIPLIER = 2       # дубль приносит удвоенную сумму и обязывает бросать ещё
+
+    def __init__(self, rng=random):
+        self.rng = rng
+
+    def join(self, game, user_id, username):
+        if game.phase != "lobby":
+            return [Rejected("Лобби закрыто!")]
+        if len(game.players) >= self.MAX_PLAYERS:
+            return [Rejected("Максимум 4 игрока.")]
+        if user_id in game.players:
+            return [Rejected("Ты уже в игре!")]
+        game.players[user_id] = DoublePigPlayer(username)
+        return [Joined(user_id)]
+
+    def set_target(self, game, target):
+        if game.phase != "lobby":
+            return [Rejected("Нельзя менять цель теперь.")]
+        if len(game.players) < 2:
+            return [Rejected("Нужно минимум 2 игрока.")]
+        if target <= 0:
+            return [Rejected("Недопустимая цель!")]
+        game.target_score = target
+        game.phase = "playing"
+        game.turn_order = list(game.players.keys())
+        self.rng.shuffle(game.turn_order)
+        game.current_player = game.turn_order[0]
+        game.history.clear()
+        for p in game.players.values():
+            p.turn_points = 0
+            p.must_roll = False
+        return [Configured("target_score", target), Started(game.current_player)]
+
+    @staticmethod
+    def _check_turn(game, user_id):
+        if game.phase != "playing":
+            return [Rejected("Игра не запущена.")]
+        if user_id != game.current_player:
+            return [Rejected("⏳ Сейчас ход другого игрока!\nПодожди своей очереди 😉")]
+        return None
+
+    @staticmethod
+    def _advance_turn(game):
+        game.turn_order.append(game.turn_order.pop(0))
+        game.current_player = game.turn_order[0]
+        return TurnPassed(game.current_player)
+
+    def roll(self, game, user_id):
+        rejected = self._check_turn(game, user_id)
+        if rejected:
+            return rejected
+        d1, d2 = self.rng.randint(1, self.FACES), self.rng.randint(1, self.FACES)
+        player = game.players[user_id]
+        entry = PigRoll(user_id, d1, d2)
+        game.history.append(entry)
+
+        if d1 == self.BUST_FACE or d2 == self.BUST_FACE:
+            # Единица сжигает очки хода, две единицы — весь счёт
+            total_lost = d1 == d2
+            if total_lost:
+                player.total = 0
+            player.turn_points = 0
+            player.must_roll = False
+            return [entry, Busted(user_id, total_lost), self._advance_turn(game)]
+
+        if d1 == d2:
+            player.turn_points += (d1 + d2) * self.DOUBLE_MULTIPLIER
+            player.must_roll = True
+        else:
+            player.turn_points += d1 + d2
+            player.must_roll = False
+        return [entry]
+
+    def hold(self, game, user_id):
+        rejected = self._check_turn(game, user_id)
+        if rejected:
+            return rejected
+        player = game.players[user_id]
+        if player.must_roll:
+            return [Rejected("После дубля нельзя остановиться — нужно бросать ещё! 🎲")]
+
+        entry = PigHold(user_id, player.turn_points)
+        player.total += player.turn_points
+        player.turn_points = 0
+        game.history.append(entry)
+
+        if player.total >= game.target_score:
+            game.phase = "finished"
+            return [entry, Finished(user_id)]
+        return [entry, self._advance_turn(game)]
@@ -0,0 +1,208 @@
+# event_log.py
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+
+from engines import DoublePigEngine, Finished, PigHold, PigRoll, Started, is_rejected
+from models import DoublePigGame
+
+logger = logging.getLogger(__name__)
+
+# 📝 Журнал событий партий: JSONL, только дописывается. Пустой путь — журнал выключен.
+GAME_EVENT_LOG = os.getenv("GAME_EVENT_LOG", "")
+EVENT_LOG_BUFFER = int(os.getenv("EVENT_LOG_BUFFER", str(64 * 1024)))  # байт до принудительной записи
+EVENT_LOG_FLUSH_INTERVAL = float(os.getenv("EVENT_LOG_FLUSH_INTERVAL", "1"))    # с от записи до диска, не дольше
+
+
+class EventLog:
+    """Append-only журнал: строки копятся в памяти и уходят на диск одним os.write на
+    файл с O_APPEND — через flush_interval после первой несохранённой записи, при
+    переполнении буфера и при остановке. При падении или kill теряется не больше
+    flush_interval секунд ходов (по умолчанию 1 с); запись в ОС переживает падение
+    процесса, но не отключение питания (fsync не делается).
+    Запись целыми строками за один вызов не перемешивает строки воркеров шардов (sharding.py).
+    """
+
+    def __init__(self, path=GAME_EVENT_LOG, buffer_size=EVENT_LOG_BUFFER, flush_interval=EVENT_LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.written = 0            # записей за время работы
+        self._fd = None
+        self._pending = []
+        self._pending_bytes = 0
+        self._timer = None          # asyncio.TimerHandle отложенного flush
+        self._timer_loop = None
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def append(self, game, chat_id, kind, **fields):
+        if not self.path:
+            return
+        record = {"ts": round(time.time(), 3), "game": game, "chat": chat_id, "e": kind, **fields}
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+        self._pending.append(line)
+        self._pending_bytes += len(line)
+        self.written += 1
+        if self._pending_bytes >= self.buffer_size:
+            self.flush()
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()    # вне event loop (скрипты) — сразу
+            return
+        # Таймер старого loop (main() перезапускается в новом) уже не сработает
+        if self._timer is None or self._timer_loop is not loop:
+            self._timer = loop.call_later(self.flush_interval, self.flush)
+            self._timer_loop = loop
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        data = b"".join(self._pending)
+        self._pending.clear()
+        self._pending_bytes = 0
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self._fd, data)
+        except OSError as e:
+            logger.error(f"❌ Журнал событий {self.path} недоступен, запись отключена: {e}")
+            self.path = ""
+
+    def close(self):
+        self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def read(path, game=None, chat_id=None):
+    """Записи журнала по порядку; оборванная последняя строка (падение посреди записи) пропускается."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if (game is None or record.get("game") == game) and (chat_id is None or record.get("chat") == chat_id):
+                yield record
+
+
+# 🐷 «Двойная свинка»: события движка -> записи журнала -> переигровка
+def log_double_pig(chat_id, game, events):
+    """Записать в журнал ходы из списка событий DoublePigEngine."""
+    if not event_log.enabled:
+        return
+    for event in events:
+        kind = type(event)
+        if kind is PigRoll:
+            event_log.append("double_pig", chat_id, "roll", u=event.user_id, d=[event.d1, event.d2])
+        elif kind is PigHold:
+            event_log.append("double_pig", chat_id, "hold", u=event.user_id, add=event.added)
+        elif kind is Started:
+            event_log.append("double_pig", chat_id, "start", target=game.target_score,
+                             players=[[uid, p.username] for uid, p in game.players.items()],
+                             order=list(game.turn_order))
+        elif kind is Finished:
+            event_log.append("double_pig", chat_id, "end", winner=event.winner_id)
+
+
+class _ScriptedRng:
+    """rng для движка при переигровке: отдаёт записанные кубики и порядок ходов."""
+
+    def __init__(self):
+        self.dice = deque()
+        self.order = ()
+
+    def randint(self, a, b):
+        return self.dice.popleft()
+
+    def shuffle(self, items):
+        items[:] = self.order
+
+
+def replay_double_pig(records):
+    """Переиграть партии из записей журнала через настоящий DoublePigEngine.
+
+    -> [(chat_id, game, проблемы)] по партии на каждую запись start. Проблемы — ходы,
+    которые движок отверг или посчитал иначе, чем записано (для разбора споров).
+    """
+    rng = _ScriptedRng()
+    engine = DoublePigEngine(rng)
+    current = {}    # chat_id -> (game, problems)
+    replayed = []
+    for record in records:
+        if record.get("game") != "double_pig":
+            continue
+        chat_id, kind = record["chat"], record["e"]
+        if kind == "start":
+            game, problems = DoublePigGame(), []
+            for user_id, username in record["players"]:
+                engine.join(game, user_id, username)
+            rng.order = record["order"]
+            engine.set_target(game, record["target"])
+            current[chat_id] = game, problems
+            replayed.append((chat_id, game, problems))
+            continue
+        if chat_id not in current:
+            continue    # начало партии не попало в журнал
+        game, problems = current[chat_id]
+        if kind == "roll":
+            rng.dice.clear()
+            rng.dice.extend(record["d"])
+            events = engine.roll(game, record["u"])
+        elif kind == "hold":
+            events = engine.hold(game, record["u"])
+            if not is_rejected(events) and events[0].added != record["add"]:
+                problems.append(f"hold {record['u']}: записано +{record['add']}, по правилам +{events[0].added}")
+        elif kind == "end":
+            if game.phase != "finished" or game.current_player != record["winner"]:
+                problems.append(f"end: записан победитель {record['winner']}, по правилам партия "
+                                f"{'выиграна ' + str(game.current_player) if game.phase == 'finished' else 'не окончена'}")
+            continue
+        else:
+            continue
+        if is_rejected(events):
+            problems.append(f"{kind} {record['u']}: {events[0].text}")
+    return replayed
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Переигровка партий «Двойной свинки» из журнала событий")
+    parser.add_argument("path", help="файл журнала (GAME_EVENT_LOG)")
+    parser.add_argument("--chat", type=int, default=None, help="только этот чат")
+    args = parser.parse_args()
+
+    disputed = 0
+    for chat_id, game, problems in replay_double_pig(read(args.path, "double_pig", args.chat)):
+        scores = ", ".join(f"{p.username} {p.total}" for p in game.players.values())
+        status = "окончена" if game.phase == "finished" else "идёт"
+        print(f"💬 {chat_id}: цель {game.target_score}, {status}; {scores}")
+        for problem in problems:
+            print(f"   ⚠️ {problem}")
+        disputed += bool(problems)
+    sys.exit(1 if disputed else 0)
+
+
+# Общий экземпляр для всех модулей
+event_log = EventLog()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,308 @@
+# fake_bot_api.py
+
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter, deque
+from urllib.parse import parse_qsl
+
+from webhook import HTTPServer
+
+logger = logging.getLogger(__name__)
+
+# 🧪 Подставной Bot API для нагрузочных тестов (см. loadtest.py)
+FAKE_TOKEN = "123456:LOADTEST"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot"}
+
+# Параметры, которые PTB кодирует в JSON внутри form-urlencoded тела
+_JSON_PARAMS = ("reply_markup", "entities", "allowed_updates", "commands", "reply_parameters", "message_ids")
+# Методы, на которые может прилететь искусственный 429
+_FLOODABLE = {"sendMessage", "editMessageText", "deleteMessage", "deleteMessages"}
+_NOT_MODIFIED = ("Bad Request: message is not modified: specified new message content and reply markup "
+                 "are exactly the same as a current content and reply markup of the message")
+
+
+class ApiError(Exception):
+    def __init__(self, description, error_code=400):
+        super().__init__(description)
+        self.description = description
+        self.error_code = error_code
+
+
+class _FakeServer(HTTPServer):
+    """HTTPServer со счётчиком соединений и задержкой на каждое новое соединение
+    (имитация TCP+TLS рукопожатия с api.telegram.org, которого на loopback нет)."""
+
+    def __init__(self, routes, host, port, handshake=0.0):
+        super().__init__(routes, host, port)
+        self.handshake = handshake
+        self.connections = 0
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        if self.handshake:
+            await asyncio.sleep(self.handshake)
+        await super()._handle(reader, writer)
+
+
+class FakeChat:
+    """Состояние чата на стороне подставного API: сообщения бота и сигнал об их изменении."""
+
+    __slots__ = ("chat_id", "messages", "answered", "alerts", "changed", "seq")
+
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.messages = {}      # message_id -> (text, reply_markup dict | None)
+        self.answered = {}      # callback_query_id -> seq на момент первого ответа бота
+        self.alerts = {}        # callback_query_id -> текст всплывающего ответа
+        self.changed = asyncio.Event()
+        self.seq = 0            # счётчик видимых изменений сообщений (отправка, правка)
+
+    def notify(self, visible=True):
+        if visible:
+            self.seq += 1
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class FakeBotAPI:
+    """Bot API в том же процессе: getUpdates, sendMessage, editMessageText, deleteMessage(s),
+    answerCallbackQuery, setMyCommands (+ getMe/deleteWebhook для старта PTB).
+
+    Клиентская сторона (push_command/push_callback) кладёт апдейты в очередь getUpdates,
+    а ответы бота видны через chats[chat_id]. latency — средняя задержка ответа (±50%),
+    flood_rate — доля запросов из _FLOODABLE, получающих 429 с retry_after, handshake —
+    задержка первого ответа на каждом новом соединении.
+    """
+
+    def __init__(self, token=FAKE_TOKEN, latency=0.0, flood_rate=0.0, retry_after=1,
+                 host="127.0.0.1", port=0, rng=None, handshake=0.0):
+        self.token = token
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.rng = rng or random.Random()
+        self.chats = {}
+        self.calls = Counter()          # method -> число вызовов
+        self.chat_calls = {}            # chat_id -> Counter(method)
+        self.floods = 0
+        self.double_answers = 0         # повторных ответов на одно нажатие (ошибка бота)
+        self._updates = deque()
+        self._update_ids = itertools.count(1)
+        self._query_ids = itertools.count(1)
+        self._message_ids = {}          # chat_id -> itertools.count
+        self._queries = {}              # callback_query_id -> chat_id
+        self._answered_queries = set()
+        self._new_updates = asyncio.Event()
+        self._closing = False
+        methods = {
+            "getMe": self._get_me,
+            "deleteWebhook": self._ok,
+            "setMyCommands": self._ok,
+            "getUpdates": self._get_updates,
+            "sendMessage": self._send_message,
+            "editMessageText": self._edit_message_text,
+            "deleteMessage": self._delete_message,
+            "deleteMessages": self._delete_messages,
+            "answerCallbackQuery": self._answer_callback_query,
+        }
+        routes = {("POST", f"/bot{token}/{name}"): self._route(name, fn) for name, fn in methods.items()}
+        self._server = _FakeServer(routes, host, port, handshake)
+
+    @property
+    def base_url(self):
+        return f"http://{self._server.host}:{self._server.port}/bot"
+
+    @property
+    def connections(self):
+        return self._server.connections
+
+    async def start(self):
+        await self._server.start()
+
+    async def stop(self):
+        # Отпускаем висящие long-poll запросы getUpdates
+        self._closing = True
+        self._new_updates.set()
+        await self._server.stop()
+
+    # 👥 Клиентская сторона: имитация пользователей
+    def chat(self, chat_id):
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            chat = self.chats[chat_id] = FakeChat(chat_id)
+        return chat
+
+    def push_command(self, chat_id, user_id, text):
+        command = text.split()[0]
+        self._push({"message": {
+            **self._message_head(chat_id, self._next_message_id(chat_id)),
+            "from": self._user(user_id),
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        }})
+
+    def push_callback(self, chat_id, user_id, message_id, data):
+        query_id = str(next(self._query_ids))
+        self._queries[query_id] = chat_id
+        self._push({"callback_query": {
+            "id": query_id,
+            "from": self._user(user_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": self._message_dict(chat_id, message_id),
+        }})
+        return query_id
+
+    def find_button(self, chat_id, data):
+        """message_id самого свежего сообщения бота с кнопкой data (или None)."""
+        for message_id, (_, markup) in reversed(self.chat(chat_id).messages.items()):
+            if markup and any(button.get("callback_data") == data
+                              for row in markup["inline_keyboard"] for button in row):
+                return message_id
+        return None
+
+    def _push(self, update):
+        update["update_id"] = next(self._update_ids)
+        self._updates.append(update)
+        self._new_updates.set()
+
+    @staticmethod
+    def _user(user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"player{user_id}", "username": f"player{user_id}"}
+
+    def _next_message_id(self, chat_id):
+        counter = self._message_ids.get(chat_id)
+        if counter is None:
+            counter = self._message_ids[chat_id] = itertools.count(1)
+        return next(counter)
+
+    @staticmethod
+    def _message_head(chat_id, message_id):
+        chat_type = "group" if chat_id < 0 else "private"
+        return {"message_id": message_id, "date": int(time.time()), "chat": {"id": chat_id, "type": chat_type}}
+
+    def _message_dict(self, chat_id, message_id):
+        message = {**self._message_head(chat_id, message_id), "from": BOT_USER}
+        text, markup = self.chat(chat_id).messages.get(message_id, ("", None))
+        message["text"] = text
+        if markup:
+            message["reply_markup"] = markup
+        return message
+
+    # 🌐 Серверная сторона: методы Bot API
+    def _route(self, name, fn):
+        async def handle(body, headers):
+            params = self._parse(body, headers)
+            self.calls[name] += 1
+            chat_id = params.get("chat_id", self._queries.get(params.get("callback_query_id")))
+            if chat_id is not None:
+                self.chat_calls.setdefault(chat_id, Counter())[name] += 1
+            if self.latency:
+                await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+            if name in _FLOODABLE and self.flood_rate and self.rng.random() < self.flood_rate:
+                self.floods += 1
+                return self._reply(429, {
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                })
+            try:
+                result = await fn(params)
+            except ApiError as e:
+                return self._reply(e.error_code, {"ok": False, "error_code": e.error_code,
+                                                  "description": e.description})
+            return self._reply(200, {"ok": True, "result": result})
+
+        return handle
+
+    @staticmethod
+    def _parse(body, headers):
+        if not body:
+            return {}
+        if headers.get("content-type", "").startswith("application/json"):
+            params = json.loads(body)
+        else:
+            params = dict(parse_qsl(body.decode()))
+            for name in _JSON_PARAMS:
+                if name in params:
+                    params[name] = json.loads(params[name])
+        if "chat_id" in params:
+            params["chat_id"] = int(params["chat_id"])
+        if "message_id" in params:
+            params["message_id"] = int(params["message_id"])
+        return params
+
+    @staticmethod
+    def _reply(status, payload):
+        return status, json.dumps(payload).encode(), "application/json"
+
+    async def _ok(self, params):
+        return True
+
+    async def _get_me(self, params):
+        return BOT_USER
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and not self._closing:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._updates, int(params.get("limit") or 100)))
+
+    async def _send_message(self, params):
+        chat_id = params["chat_id"]
+        chat = self.chat(chat_id)
+        message_id = self._next_message_id(chat_id)
+        chat.messages[message_id] = (params["text"], params.get("reply_markup"))
+        chat.notify()
+        return self._message_dict(chat_id, message_id)
+
+    async def _edit_message_text(self, params):
+        chat_id, message_id = params["chat_id"], params["message_id"]
+        chat = self.chat(chat_id)
+        current = chat.messages.get(message_id)
+        if current is None:
+            raise ApiError("Bad Request: message to edit not found")
+        content = (params["text"], params.get("reply_markup"))
+        if content == current:
+            raise ApiError(_NOT_MODIFIED)
+        chat.messages[message_id] = content
+        chat.notify()
+        return self._message_dict(chat_id, message_id)
+
+    async def _delete_message(self, params):
+        if self.chat(params["chat_id"]).messages.pop(params["message_id"], None) is None:
+            raise ApiError("Bad Request: message to delete not found")
+        return True
+
+    async def _delete_messages(self, params):
+        # Как и настоящий API: отсутствующие сообщения молча пропускаются
+        messages = self.chat(params["chat_id"]).messages
+        for message_id in params["message_ids"]:
+            messages.pop(message_id, None)
+        return True
+
+    async def _answer_callback_query(self, params):
+        # Как и настоящий API: на нажатие можно ответить только один раз
+        query_id = params["callback_query_id"]
+        if query_id in self._answered_queries:
+            self.double_answers += 1
+            raise ApiError("Bad Request: query is too old and response timeout expired or query ID is invalid")
+        self._answered_queries.add(query_id)
+        chat_id = self._queries.get(query_id)
+        if chat_id is not None:
+            chat = self.chat(chat_id)
+            chat.answered.setdefault(query_id, chat.seq)
+            if params.get("show_alert") in (True, "true", "True"):
+                chat.alerts[query_id] = params.get("text", "")
+            chat.notify(visible=False)
+        return True
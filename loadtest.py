@@ -0,0 +1,269 @@
+# loadtest.py
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter
+
+from fake_bot_api import FAKE_TOKEN, FakeBotAPI
+
+logger = logging.getLogger(__name__)
+
+GAMES = ("black_white", "double_pig")
+# Служебные вызовы, не относящиеся к партиям
+_SERVICE_METHODS = {"getMe", "getUpdates", "deleteWebhook", "setMyCommands"}
+
+
+class Stalled(Exception):
+    pass
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class LoadSimulation:
+    """Имитация игроков: нажимают кнопки из реальной клавиатуры бота и ждут ответа в чате.
+
+    Задержка меряется от постановки апдейта в getUpdates до первого изменения сообщений
+    в чате (sendMessage/editMessageText) после того, как бот принял нажатие (answerCallbackQuery).
+    Ответ alert'ом («не твой ход») считается отказом.
+    """
+
+    def __init__(self, api, timeout=10.0, max_clicks=2000):
+        self.api = api
+        self.timeout = timeout
+        self.max_clicks = max_clicks
+        self.latencies = []
+        self.clicks = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.finished = Counter()   # игра -> завершённых партий
+        self.stalled = Counter()    # игра -> зависших партий
+
+    async def _wait_change(self, chat, changed):
+        try:
+            await asyncio.wait_for(changed.wait(), self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return False
+
+    async def command(self, chat_id, user_id, text):
+        chat = self.api.chat(chat_id)
+        changed = chat.changed
+        started = time.perf_counter()
+        self.api.push_command(chat_id, user_id, text)
+        if not await self._wait_change(chat, changed):
+            raise Stalled(text)
+        self.latencies.append(time.perf_counter() - started)
+
+    async def click(self, chat_id, user_id, data):
+        message_id = self.api.find_button(chat_id, data)
+        if message_id is None:
+            raise Stalled(f"нет кнопки {data}")
+        chat = self.api.chat(chat_id)
+        changed = chat.changed
+        started = time.perf_counter()
+        query_id = self.api.push_callback(chat_id, user_id, message_id, data)
+        self.clicks += 1
+        while True:
+            if not await self._wait_change(chat, changed):
+                raise Stalled(data)
+            changed = chat.changed
+            if query_id in chat.alerts:
+                del chat.alerts[query_id], chat.answered[query_id]
+                self.rejected += 1
+                return False
+            if chat.answered.get(query_id, chat.seq) < chat.seq:
+                del chat.answered[query_id]
+                self.latencies.append(time.perf_counter() - started)
+                return True
+
+    async def wait_for_button(self, chat_id, *data):
+        """Дождаться, пока в чате появится одна из кнопок; вернуть её callback_data."""
+        chat = self.api.chat(chat_id)
+        while True:
+            for item in data:
+                if self.api.find_button(chat_id, item):
+                    return item
+            if not await self._wait_change(chat, chat.changed):
+                raise Stalled(f"нет кнопок {data}")
+
+    # 🎲 Сценарии партий: через /start и реальные callback_data
+    async def play_black_white(self, chat_id, users, turn_of, rng):
+        await self.command(chat_id, users[0], "/start")
+        await self.click(chat_id, users[0], "select_game:black_white")
+        for user_id in users:
+            if self.api.find_button(chat_id, "bw_join"):
+                await self.click(chat_id, user_id, "bw_join")
+        await self.click(chat_id, users[0], f"bw_set_rounds_{rng.randint(2, 4)}")
+        await self.click(chat_id, users[0], f"bw_set_dice_{rng.choice((4, 6, 8))}")
+        for _ in range(self.max_clicks):
+            action = await self.wait_for_button(chat_id, "bw_new_game", "bw_draw", "bw_roll")
+            if action == "bw_new_game":
+                return
+            await self.click(chat_id, turn_of(chat_id), action)
+        raise Stalled("слишком много нажатий")
+
+    async def play_double_pig(self, chat_id, users, turn_of, rng):
+        await self.command(chat_id, users[0], "/start")
+        await self.click(chat_id, users[0], "select_game:double_pig")
+        for user_id in users:
+            if self.api.find_button(chat_id, "dp_join"):
+                await self.click(chat_id, user_id, "dp_join")
+        await self.click(chat_id, users[0], "dp_set_target_50")
+        for _ in range(self.max_clicks):
+            await self.wait_for_button(chat_id, "dp_new_game", "dp_roll")
+            if self.api.find_button(chat_id, "dp_new_game"):
+                return
+            hold = self.api.find_button(chat_id, "dp_hold") and rng.random() < 0.3
+            await self.click(chat_id, turn_of(chat_id), "dp_hold" if hold else "dp_roll")
+        raise Stalled("слишком много нажатий")
+
+
+def _turn_lookup():
+    # Чья очередь — берём из состояния игры в этом же процессе (сами нажатия идут через API)
+    import black_white
+    import double_pig
+
+    return {
+        "black_white": lambda chat_id: black_white._games[chat_id].current_player,
+        "double_pig": lambda chat_id: double_pig._games[chat_id].current_player,
+    }
+
+
+async def run_loadtest(chats=100, games=GAMES, concurrency=None, latency=0.0, flood_rate=0.0,
+                       timeout=10.0, group=True, seed=None):
+    """Прогнать chats партий через настоящий Application из main.py; вернуть отчёт (dict)."""
+    import main
+    from webhook import ALLOWED_UPDATES
+
+    rng = random.Random(seed)
+    api = FakeBotAPI(token=main.TOKEN, latency=latency, flood_rate=flood_rate, rng=random.Random(seed))
+    await api.start()
+    app = main.build_application(base_url=api.base_url)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.updater.start_polling(poll_interval=0, timeout=1, allowed_updates=ALLOWED_UPDATES,
+                                    drop_pending_updates=True)
+    await app.start()
+
+    sim = LoadSimulation(api, timeout=timeout)
+    turn_of = _turn_lookup()
+    semaphore = asyncio.Semaphore(concurrency or chats)
+    game_of_chat = {}
+
+    async def play(index):
+        game = games[index % len(games)]
+        chat_id = -(index + 1) if group else index + 1
+        users = [(index + 1) * 10 + k for k in (1, 2)]
+        game_of_chat[chat_id] = game
+        async with semaphore:
+            try:
+                await getattr(sim, f"play_{game}")(chat_id, users, turn_of[game], rng)
+                sim.finished[game] += 1
+            except Stalled as e:
+                sim.stalled[game] += 1
+                logger.warning(f"🧪 Партия в чате {chat_id} зависла: {e}")
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(play(i) for i in range(chats)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await app.updater.stop()
+        await app.stop()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        await app.shutdown()
+        await api.stop()
+
+    calls_per_game = {}
+    for game in games:
+        total = Counter()
+        for chat_id, counter in api.chat_calls.items():
+            if game_of_chat.get(chat_id) == game:
+                total.update({m: n for m, n in counter.items() if m not in _SERVICE_METHODS})
+        played = sim.finished[game] + sim.stalled[game]
+        calls_per_game[game] = {m: n / played for m, n in sorted(total.items())} if played else {}
+
+    latencies = sorted(sim.latencies)
+    return {
+        "chats": chats,
+        "elapsed": elapsed,
+        "finished": dict(sim.finished),
+        "stalled": dict(sim.stalled),
+        "clicks": sim.clicks,
+        "rejected": sim.rejected,
+        "timeouts": sim.timeouts,
+        "throughput": sim.clicks / elapsed if elapsed else 0.0,
+        "latency": {q: _percentile(latencies, q / 100) for q in (50, 95, 99)},
+        "calls_per_game": calls_per_game,
+        "api_calls": dict(api.calls),
+        "floods": api.floods,
+        "double_answers": api.double_answers,
+    }
+
+
+def print_report(report):
+    print(f"Чатов: {report['chats']}, время: {report['elapsed']:.1f} с")
+    print(f"Партий завершено: {report['finished']}, зависло: {report['stalled']}")
+    print(f"Нажатий: {report['clicks']} ({report['throughput']:.1f}/с), "
+          f"отказов: {report['rejected']}, без ответа: {report['timeouts']}")
+    latency = report["latency"]
+    print("Задержка нажатие→правка: " + ", ".join(f"p{q} {v * 1000:.0f} мс" for q, v in latency.items()))
+    for game, calls in report["calls_per_game"].items():
+        total = sum(calls.values())
+        detail = ", ".join(f"{m} {n:.1f}" for m, n in calls.items())
+        print(f"API-вызовов на партию {game}: {total:.1f} ({detail})")
+    print(f"Искусственных 429: {report['floods']}")
+    print(f"Повторных ответов на нажатие: {report['double_answers']}")
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на подставном Bot API")
+    parser.add_argument("--chats", type=int, default=100, help="число одновременных чатов (по партии в каждом)")
+    parser.add_argument("--games", default=",".join(GAMES), help="игры через запятую")
+    parser.add_argument("--concurrency", type=int, default=0, help="сколько партий идёт одновременно (0 — все)")
+    parser.add_argument("--latency", type=float, default=0.0, help="средняя задержка ответа API, с")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля sendMessage/edit/delete с ответом 429")
+    parser.add_argument("--timeout", type=float, default=10.0, help="ожидание ответа на нажатие, с")
+    parser.add_argument("--private", action="store_true", help="личные чаты вместо групп")
+    parser.add_argument("--no-limits", action="store_true", help="отключить лимиты TelegramRateLimiter")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    # Настройки модулей бота читаются при импорте main, поэтому задаём их до него
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", FAKE_TOKEN)
+    os.environ.setdefault("GAME_STORE", "none")
+    if args.no_limits:
+        for name in ("RATE_GLOBAL_PER_SEC", "RATE_GROUP_PER_MIN", "RATE_PRIVATE_PER_SEC", "RATE_EDIT_PER_MIN"):
+            os.environ[name] = "1e9"
+    import main  # noqa: F401  (настраивает логирование, см. log_config.py)
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run_loadtest(
+        chats=args.chats,
+        games=tuple(args.games.split(",")),
+        concurrency=args.concurrency or None,
+        latency=args.latency,
+        flood_rate=args.flood_rate,
+        timeout=args.timeout,
+        group=not args.private,
+        seed=args.seed,
+    ))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,160 @@
+# log_config.py
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+# 🔧 Логирование: уровень, формат ("text" или "json") и запись из фонового потока.
+# При LOG_QUEUE=1 обработчик в event loop только кладёт запись в очередь, а форматирование
+# и вывод делает поток QueueListener — медленный вывод не задерживает чаты
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE = os.getenv("LOG_QUEUE", "1") == "1"
+LOG_HTTPX_LEVEL = os.getenv("LOG_HTTPX_LEVEL", "WARNING").upper()   # httpx пишет INFO на каждый вызов API
+
+# Одинаковые предупреждения и ошибки (одно место в коде) — не больше LOG_REPEAT_BURST
+# за LOG_REPEAT_WINDOW секунд, остальные только подсчитываются
+LOG_REPEAT_WINDOW = float(os.getenv("LOG_REPEAT_WINDOW", "60"))
+LOG_REPEAT_BURST = int(os.getenv("LOG_REPEAT_BURST", "5"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Контекст текущего апдейта для структурных полей: (chat_id, game, action)
+_context = contextvars.ContextVar("log_context", default=None)
+_NO_CONTEXT = (None, None, None)
+
+
+def bind(chat_id=None, game=None, action=None):
+    """Поля chat_id/game/action для записей из текущей задачи; -> токен для unbind()."""
+    return _context.set((chat_id, game, action))
+
+
+def unbind(token):
+    _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Переносит контекст апдейта в запись. Стоит на обработчике в потоке event loop:
+    поток записи контекстных переменных задачи уже не видит."""
+
+    def filter(self, record):
+        chat_id, game, action = _context.get() or _NO_CONTEXT
+        # Явное extra={"chat_id": ...} важнее контекста
+        if not hasattr(record, "chat_id"):
+            record.chat_id = chat_id
+        if not hasattr(record, "game"):
+            record.game = game
+        if not hasattr(record, "action"):
+            record.action = action
+        return True
+
+
+class RepeatFilter(logging.Filter):
+    """Ограничивает повторы WARNING и выше из одного места в коде (файл и строка):
+    flood control в десятках чатов не должен превращаться в десятки строк в секунду.
+    Первая запись нового окна сообщает, сколько было подавлено в прошлом."""
+
+    def __init__(self, window=LOG_REPEAT_WINDOW, burst=LOG_REPEAT_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.suppressed = 0     # всего подавлено с запуска
+        self._sites = {}        # (pathname, lineno) -> [начало окна, записей в окне, подавлено]
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        now = time.monotonic()
+        site = self._sites.get((record.pathname, record.lineno))
+        if site is None or now - site[0] >= self.window:
+            dropped = site[2] if site else 0
+            self._sites[(record.pathname, record.lineno)] = [now, 1, 0]
+            if dropped:
+                record.msg = f"{record.getMessage()} (ещё {dropped} таких же подавлено за {self.window:g}s)"
+                record.args = None
+            return True
+        if site[1] < self.burst:
+            site[1] += 1
+            return True
+        site[2] += 1
+        self.suppressed += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON: ts, level, logger, msg и поля контекста апдейта."""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in ("chat_id", "game", "action"):
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # В потоке event loop только подставляем аргументы; время, JSON и трассировку
+        # исключения форматирует поток записи
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+_listener = None
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, use_queue=LOG_QUEUE, stream=None):
+    """Настроить корневой логгер (вместо logging.basicConfig); повторный вызов перенастраивает."""
+    global _listener
+    stop_logging()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    if use_queue:
+        records = queue.SimpleQueue()
+        handler = _QueueHandler(records)
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = output
+    handler.addFilter(RepeatFilter())
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    logging.getLogger("httpx").setLevel(LOG_HTTPX_LEVEL)
+    return handler
+
+
+def stop_logging():
+    """Дописать очередь и остановить поток записи (вызывается и при выходе)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
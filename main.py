@@ -6,39 +6,54 @@ import asyncio
 import threading
 import time
 import urllib.request
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
+from telegram import Update, BotCommand
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, ContextTypes
 
-# 🔧 Настройка логирования
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+import registry
+from auto_delete import deleter
+from chat_mailbox import ChatMailboxProcessor
+from event_log import event_log
+from log_config import setup_logging
+from metrics import HANDLER_SECONDS, loop_lag, metrics_server, timed
+from rate_limit import GLOBAL_PER_SEC, TelegramRateLimiter
+from sharding import BOT_WORKERS, run_front
+from storage import persistence
+from tracing import ReceivedQueue, tracer
+from sweeper import sweeper
+from transport import build_request
+from webhook import ALLOWED_UPDATES, run_webhook
+
+# 🔧 Настройка логирования (LOG_LEVEL, LOG_FORMAT, LOG_QUEUE — см. log_config.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # 🔑 Токен бота
 TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', "7528268046:AAHk9nL55UUflfZg0RXHvKM149JdX76vGwQ")
 
-# 🎮 Импорты игр с обработкой ошибок
-try:
-    from black_white import start_black_white, stop_black_white, rules_black_white, button_handler_black_white
-    from double_pig import start_double_pig, stop_double_pig, rules_double_pig, button_handler_double_pig
+# 📡 Режим получения апдейтов: "polling" или "webhook" (см. webhook.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
 
-    logger.info("✅ Все игры успешно загружены")
-except ImportError as e:
-    logger.error(f"❌ Ошибка импорта игр: {e}")
+# 🔌 Адрес Bot API (локальный telegram-bot-api или fake_bot_api.py), например http://localhost:8081/bot
+BOT_API_URL = os.getenv("BOT_API_URL", "")
 
+# 🎮 Игры регистрируются сами при импорте (registry.GAME_MODULES); сломанная игра не роняет бота
+registry.load_games()
 
-    # Создаем заглушки чтобы бот не падал
-    async def game_stub(*args, **kwargs):
-        await args[0].message.reply_text("⚠️ Игра временно недоступна")
+# 📊 Глобальное состояние игр
+active_games = {}
+_STORE_NAMESPACE = "main"
+persistence.register(_STORE_NAMESPACE, active_games)
+sweeper.register_index(active_games, _STORE_NAMESPACE)
 
 
-    start_black_white = stop_black_white = rules_black_white = button_handler_black_white = game_stub
-    start_double_pig = stop_double_pig = rules_double_pig = button_handler_double_pig = game_stub
+def _forget_active_game(chat_id, key):
+    # Игра закрыта (/stop или смена игры) — /rules и /stop больше не должны её находить
+    if active_games.get(chat_id) == key:
+        del active_games[chat_id]
+        persistence.touch(_STORE_NAMESPACE, chat_id)
 
-# 📊 Глобальное состояние игр
-active_games = {}
+
+registry.add_close_hook(_forget_active_game)
 
 
 # 🔄 Функция самопинга чтобы Render не останавливал сервис
@@ -61,28 +76,16 @@ def start_keep_alive():
     logger.info("🔛 Самопинг активирован")
 
 
-# 🗑️ Автоудаление сообщений
-async def _auto_delete_message(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int, delay: int = 8):
-    await asyncio.sleep(delay)
-    try:
-        await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-    except Exception:
-        pass
-
-
 # 🎯 Команда /start
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        keyboard = [
-            [InlineKeyboardButton("Чёрные-Белые", callback_data="select_game:black_white")],
-            [InlineKeyboardButton("Двойная свинка", callback_data="select_game:double_pig")],
-        ]
         await update.message.reply_text(
             "🎲 *Выберите игру:*",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=registry.game_menu_markup(),
             parse_mode="Markdown"
         )
-        logger.info(f"🎮 Пользователь {update.effective_user.id} запустил бота")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"🎮 Пользователь {update.effective_user.id} запустил бота")
     except Exception as e:
         logger.error(f"❌ Ошибка в /start: {e}")
         await update.message.reply_text("❌ Произошла ошибка. Попробуйте позже.")
@@ -92,35 +95,31 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         query = update.callback_query
-        await query.answer()
         chat_id = query.message.chat.id
-        data = query.data
+        prefix, action, args = registry.parse_callback(query.data)
 
         # Выбор игры
-        if data.startswith("select_game:"):
-            game_type = data.split(":", 1)[1]
+        if prefix == registry.SELECT_GAME:
+            game = registry.get(args[0])
+            if game is None:
+                await query.answer("⚠️ Игра временно недоступна", show_alert=True)
+                return
+            # На нажатие отвечаем ровно один раз: здесь, а в игре — в registry.handle_click
+            await query.answer()
             try:
                 await context.bot.delete_message(chat_id=chat_id, message_id=query.message.message_id)
             except Exception:
                 pass
-
-            if game_type == "black_white":
-                active_games[chat_id] = "black_white"
-                await start_black_white(update, context)
-            elif game_type == "double_pig":
-                active_games[chat_id] = "double_pig"
-                await start_double_pig(update, context)
+            active_games[chat_id] = game.key
+            persistence.touch(_STORE_NAMESPACE, chat_id)
+            await game.start(update, context)
             return
 
         # Передача управления в активную игру
-        if chat_id in active_games:
-            current_game = active_games[chat_id]
-            if current_game == "black_white" and data.startswith("bw_"):
-                await button_handler_black_white(update, context)
-                return
-            elif current_game == "double_pig" and data.startswith("dp_"):
-                await button_handler_double_pig(update, context)
-                return
+        game = registry.by_prefix(prefix)
+        if game and await persistence.restore(_STORE_NAMESPACE, chat_id) and active_games[chat_id] == game.key:
+            await game.handle_click(update, context, action, args)
+            return
 
         await query.answer("Сначала выберите игру командой /start", show_alert=True)
     except Exception as e:
@@ -131,17 +130,16 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         chat_id = update.effective_chat.id
-        if chat_id in active_games:
-            game_type = active_games[chat_id]
-            if game_type == "black_white":
-                await stop_black_white(update, context)
-            elif game_type == "double_pig":
-                await stop_double_pig(update, context)
-            del active_games[chat_id]
+        if await persistence.restore(_STORE_NAMESPACE, chat_id):
+            game = registry.get(active_games[chat_id])
+            if game:
+                await game.stop(update, context)
+            if active_games.pop(chat_id, None) is not None:
+                persistence.touch(_STORE_NAMESPACE, chat_id)
             logger.info(f"⏹️ Игра остановлена в чате {chat_id}")
         else:
             msg = await update.message.reply_text("Нет активной игры. Начните с /start")
-            asyncio.create_task(_auto_delete_message(context, chat_id, msg.message_id))
+            deleter.schedule(chat_id, msg.message_id)
     except Exception as e:
         logger.error(f"❌ Ошибка в /stop: {e}")
 
@@ -150,23 +148,21 @@ async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def rules(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         chat_id = update.effective_chat.id
-        if chat_id in active_games:
-            game_type = active_games[chat_id]
-            if game_type == "black_white":
-                await rules_black_white(update, context)
-            elif game_type == "double_pig":
-                await rules_double_pig(update, context)
+        if await persistence.restore(_STORE_NAMESPACE, chat_id):
+            game = registry.get(active_games[chat_id])
+            if game:
+                await game.rules(update, context)
         else:
             msg = await update.message.reply_text("Нет активной игры. Начните с /start")
-            asyncio.create_task(_auto_delete_message(context, chat_id, msg.message_id))
+            deleter.schedule(chat_id, msg.message_id)
     except Exception as e:
         logger.error(f"❌ Ошибка в /rules: {e}")
 
 
 # ⚙️ Настройка команд бота
-async def post_init(application):
+async def set_bot_commands(bot):
     try:
-        await application.bot.set_my_commands([
+        await bot.set_my_commands([
             BotCommand("start", "Выбрать игру"),
             BotCommand("stop", "Остановить текущую игру"),
             BotCommand("rules", "Показать правила текущей игры"),
@@ -176,6 +172,67 @@ async def post_init(application):
         logger.error(f"❌ Ошибка установки команд: {e}")
 
 
+async def post_init(application):
+    await set_bot_commands(application.bot)
+    await start_services(application)
+
+
+async def start_services(application, owns=None):
+    """Фоновые службы процесса. owns(chat_id) — воркер шарда: восстанавливает и чистит
+    только свои чаты (sharding.py), а меню команд за него ставит фронт."""
+    # 🧹 Выселение простаивающих игр; заодно чистим корзины лимитера по ушедшим чатам
+    if application.bot.rate_limiter:
+        sweeper.add_cleanup(application.bot.rate_limiter.prune)
+    sweeper.start(owns)
+    # 🗑️ Отложенные удаления (в том числе недоудалённые до рестарта)
+    await deleter.start(application.bot, owns)
+    # 📊 Метрики (если задан METRICS_PORT) и замер задержки event loop
+    loop_lag.start()
+    await metrics_server.start()
+
+
+# 💾 Сохранение несохранённых чекпоинтов при остановке
+async def post_shutdown(application):
+    sweeper.stop()
+    deleter.stop()
+    loop_lag.stop()
+    await metrics_server.stop()
+    tracer.close()
+    event_log.close()
+    await persistence.close()
+
+
+# 🏗️ Сборка приложения (используется и воркерами шардов, см. sharding.py)
+def build_application(global_share=1.0, with_updater=True, base_url=BOT_API_URL, on_init=post_init):
+    builder = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        # Отдельные пулы для исходящих вызовов и для getUpdates (HTTP_PROFILE, transport.py)
+        .request(build_request("bot"))
+        .get_updates_request(build_request("updates", updates=True))
+        .rate_limiter(TelegramRateLimiter(global_per_sec=GLOBAL_PER_SEC * global_share))
+        # Чаты обрабатываются параллельно, апдейты внутри чата — по очереди (chat_mailbox.py)
+        .concurrent_updates(ChatMailboxProcessor())
+        # Очередь апдейтов отмечает их приём — фаза "app_queue" трасс и в polling (tracing.py)
+        .update_queue(ReceivedQueue())
+        .post_init(on_init)
+        .post_shutdown(post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if not with_updater:
+        builder = builder.updater(None)
+    app = builder.build()
+
+    # Регистрируем обработчики
+    # Длительность каждого обработчика — в bot_handler_seconds (metrics.py)
+    app.add_handler(CommandHandler("start", timed(HANDLER_SECONDS.labels("start"), start)))
+    app.add_handler(CommandHandler("stop", timed(HANDLER_SECONDS.labels("stop"), stop)))
+    app.add_handler(CommandHandler("rules", timed(HANDLER_SECONDS.labels("rules"), rules)))
+    app.add_handler(CallbackQueryHandler(timed(HANDLER_SECONDS.labels("button_handler"), button_handler)))
+    return app
+
+
 # 🚀 Главная функция
 def main():
     try:
@@ -184,21 +241,27 @@ def main():
         # Запускаем самопинг (пока заглушка)
         # start_keep_alive()  # 🚨 РАСКОММЕНТИРУЙТЕ КОГДА БУДЕТ URL RENDER
 
-        # Создаем приложение
-        app = ApplicationBuilder().token(TOKEN).post_init(post_init).build()
+        if BOT_WORKERS > 0:
+            # Фронт-процесс раздаёт апдейты воркерам по chat_id
+            logger.info(f"🧩 Многопроцессный режим: {BOT_WORKERS} воркеров")
+            asyncio.run(run_front(TOKEN, BOT_WORKERS, mode=BOT_MODE,
+                                  drop_pending_updates=not persistence.enabled,
+                                  on_start=set_bot_commands))
+            return
 
-        # Регистрируем обработчики
-        app.add_handler(CommandHandler("start", start))
-        app.add_handler(CommandHandler("stop", stop))
-        app.add_handler(CommandHandler("rules", rules))
-        app.add_handler(CallbackQueryHandler(button_handler))
+        # Создаем приложение
+        app = build_application()
 
         # Запускаем бота
         logger.info("✅ Бот успешно запущен и готов к работе!")
-        app.run_polling(
-            drop_pending_updates=True,
-            allowed_updates=Update.ALL_TYPES
-        )
+        if BOT_MODE == "webhook":
+            asyncio.run(run_webhook(app, drop_pending_updates=not persistence.enabled))
+        else:
+            # Если игры сохраняются, клики во время рестарта не выбрасываем
+            app.run_polling(
+                drop_pending_updates=not persistence.enabled,
+                allowed_updates=ALLOWED_UPDATES
+            )
 
     except Exception as e:
         logger.error(f"💥 Критическая ошибка: {e}")
@@ -208,4 +271,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,283 @@
+# metrics.py
+
+import asyncio
+import bisect
+import functools
+import logging
+import os
+import time
+
+from webhook import HTTPServer
+
+logger = logging.getLogger(__name__)
+
+# 📊 Метрики в формате Prometheus: GET METRICS_PATH на METRICS_PORT (0 — выключено).
+# В многопроцессном режиме воркер шарда i слушает METRICS_PORT + 1 + i (см. sharding.py)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "0.0.0.0")
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "1"))   # период замера задержки event loop, с
+
+# Границы корзин гистограмм по умолчанию, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# 🔢 Серии. Запись — инкремент поля уже созданного объекта: без блокировок (всё в одном
+# event loop) и без выделения памяти. Дочерние серии создаются один раз на набор меток;
+# горячий код берёт их через labels() заранее и дальше держит ссылку.
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # последняя корзина — +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+
+class Metric:
+    """Семейство серий с одинаковым именем и набором меток."""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}     # значения меток -> серия
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: ожидались метки {self.labelnames}, получено {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for values, child in list(self._children.items()):
+            self._render_child(lines, values, child)
+
+    def _render_child(self, lines, values, child):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, lines, values, child):
+        lines.append(f"{self.name}{_label_text(self.labelnames, values)} {_number(child.value)}")
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, lines, values, child):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}")
+        labels = _label_text(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+
+
+class Gauge(Metric):
+    """Значение снимается при сборе: collect() -> число или {значения меток: число}."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, collect, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def render(self, lines):
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.error(f"📊 Метрика {self.name} не собрана: {e}")
+            return
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} gauge")
+        items = values.items() if isinstance(values, dict) else (((), values),)
+        for label_values, value in items:
+            lines.append(f"{self.name}{_label_text(self.labelnames, label_values)} {_number(value)}")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, collect, labelnames=()):
+        return self._add(Gauge(name, documentation, collect, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            metric.render(lines)
+        return "\n".join(lines) + "\n"
+
+
+def timed(child, fn):
+    """Обернуть async-обработчик: длительность каждого вызова уходит в child (HistogramChild)."""
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            child.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+# ⏱️ Задержка event loop: насколько позже срока просыпается sleep(interval)
+class LoopLagMonitor:
+    def __init__(self, histogram, interval=LOOP_LAG_INTERVAL):
+        self.child = histogram.labels()
+        self.interval = interval
+        self.last = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.last = max(0.0, time.monotonic() - started - self.interval)
+            self.child.observe(self.last)
+
+
+# 🌐 Экспорт по HTTP (общий с webhook минимальный сервер)
+class MetricsServer:
+    def __init__(self, registry, port=METRICS_PORT, host=METRICS_LISTEN, path=METRICS_PATH):
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.path = path
+        self._routes = {("GET", path): self._handle}
+        self._server = None
+
+    @property
+    def enabled(self):
+        return bool(self.port)
+
+    def add_route(self, path, handler):
+        """Дополнительный GET-адрес на том же порту (например, трассы из tracing.py)."""
+        self._routes[("GET", path)] = handler
+
+    async def _handle(self, body, headers):
+        return 200, self.registry.render().encode(), _CONTENT_TYPE
+
+    async def start(self):
+        if not self.port or self._server:
+            return
+        self._server = HTTPServer(self._routes, self.host, self.port)
+        try:
+            await self._server.start()
+        except OSError as e:
+            logger.error(f"📊 Порт метрик {self.port} недоступен, экспорт выключен: {e}")
+            self._server = None
+            return
+        logger.info(f"📊 Метрики: http://{self.host}:{self._server.port}{self.path}")
+
+    async def stop(self):
+        if self._server:
+            await self._server.stop()
+            self._server = None
+
+
+# Общие экземпляры для всех модулей
+metrics = MetricsRegistry()
+HANDLER_SECONDS = metrics.histogram(
+    "bot_handler_seconds", "Длительность обработчиков команд и кнопок", ("handler",))
+API_CALLS = metrics.counter(
+    "bot_api_calls_total", "Вызовы Bot API по методу и исходу (ok, flood, error)", ("method", "outcome"))
+FLOOD_WAIT_SECONDS = metrics.histogram(
+    "bot_flood_wait_seconds", "Паузы чатов после 429 (retry_after)",
+    buckets=(1, 2, 5, 10, 30, 60, 120, 300))
+THROTTLE_SLEEP_SECONDS = metrics.counter(
+    "bot_throttle_sleep_seconds_total", "Время ожидания лимитов перед отправкой", ("scope",))
+LOOP_LAG_SECONDS = metrics.histogram(
+    "bot_event_loop_lag_seconds", "Опоздание event loop относительно таймера",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+loop_lag = LoopLagMonitor(LOOP_LAG_SECONDS)
+metrics_server = MetricsServer(metrics)
@@ -0,0 +1,173 @@
+# models.py
+
+import random
+import time
+from collections import deque
+from dataclasses import MISSING, dataclass, field, fields
+from typing import ClassVar
+
+from rendering import ThrowHistoryCache
+
+# Сколько последних бросков «Двойной свинки» держать для табло; полная запись — в event_log.py
+PIG_HISTORY_SIZE = 6
+
+
+# 🎲 Пул кубиков «Чёрные-Белые»: хранит только количество белых и чёрных
+class DicePool:
+    __slots__ = ("white", "black")
+
+    def __init__(self, white=0, black=0):
+        self.white = white
+        self.black = black
+
+    @classmethod
+    def full(cls, dice_count):
+        return cls(dice_count // 2, dice_count // 2)
+
+    def __len__(self):
+        return self.white + self.black
+
+    def __repr__(self):
+        return f"DicePool(white={self.white}, black={self.black})"
+
+    def __getstate__(self):
+        return self.white, self.black
+
+    def __setstate__(self, state):
+        self.white, self.black = state
+
+    def refill(self, dice_count):
+        self.white = self.black = dice_count // 2
+
+    def draw(self, count, rng=random):
+        """Вытянуть count кубиков без возвращения; возвращает (белых, чёрных)."""
+        white = 0
+        for _ in range(count):
+            if rng.randrange(self.white + self.black) < self.white:
+                self.white -= 1
+                white += 1
+            else:
+                self.black -= 1
+        return white, count - white
+
+    def take_all(self):
+        drawn = (self.white, self.black)
+        self.white = self.black = 0
+        return drawn
+
+
+# 📝 Записи бросков фиксированного размера
+@dataclass(slots=True, frozen=True)
+class Throw:
+    """Бросок в «Чёрные-Белые»: значения белых и чёрных кубиков."""
+    user_id: int
+    whites: tuple
+    blacks: tuple
+
+    @property
+    def result(self):
+        return sum(self.whites) - sum(self.blacks)
+
+
+@dataclass(slots=True, frozen=True)
+class PigRoll:
+    """Бросок двух кубиков в «Двойной свинке»."""
+    user_id: int
+    d1: int
+    d2: int
+
+
+@dataclass(slots=True, frozen=True)
+class PigHold:
+    """Фиксация очков хода в «Двойной свинке»."""
+    user_id: int
+    added: int
+
+
+# 👤 Игроки
+@dataclass(slots=True)
+class Player:
+    username: str = ""
+
+
+@dataclass(slots=True)
+class BlackWhitePlayer(Player):
+    white_total: int = 0
+    black_total: int = 0
+    has_played_this_round: bool = False
+    last_roll: Throw = None
+    pending_draw: tuple = None      # (белых, чёрных) вытянуто, но ещё не брошено
+
+    @property
+    def score(self):
+        return self.white_total - self.black_total
+
+
+@dataclass(slots=True)
+class DoublePigPlayer(Player):
+    total: int = 0
+    turn_points: int = 0
+    must_roll: bool = False
+
+
+# 🎮 Игры
+@dataclass(slots=True)
+class Game:
+    players: dict = field(default_factory=dict)     # user_id -> Player
+    phase: str = "lobby"
+    main_message_id: int = None
+    turn_order: list = field(default_factory=list)
+    current_player: int = None
+    last_active: float = field(default_factory=time.time)  # время последнего действия (для sweeper.py)
+    dirty: bool = field(default=False, repr=False, compare=False)  # нужна перерисовка после перехода
+
+    # Поля, которые не сохраняются, а пересоздаются при загрузке (default / default_factory)
+    _TRANSIENT: ClassVar[tuple] = ("dirty",)
+
+    def __getstate__(self):
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name not in self._TRANSIENT}
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            # Старый позиционный формат (до появления last_active)
+            names = [f.name for f in fields(self) if f.name not in ("last_active", "dirty")]
+            state = {name: value for name, value in zip(names, state) if name not in self._TRANSIENT}
+        # Недостающие поля (транзиентные и добавленные позже) берём из значений по умолчанию
+        for f in fields(self):
+            if f.name in state:
+                value = state[f.name]
+            elif f.default_factory is not MISSING:
+                value = f.default_factory()
+            else:
+                value = f.default
+            object.__setattr__(self, f.name, value)
+
+
+@dataclass(slots=True)
+class BlackWhiteGame(Game):
+    rounds_total: int = None
+    dice_count: int = None
+    current_round: int = 1
+    round_history: list = field(default_factory=list)   # [[Throw, ...] на каждый раунд]
+    pool: DicePool = field(default_factory=DicePool)
+    history_message_id: int = None                      # страница «📜 История», если её открывали
+    history_view: ThrowHistoryCache = field(default_factory=ThrowHistoryCache, repr=False, compare=False)
+
+    # Кэш рендера не сохраняется — он восстанавливается из round_history
+    _TRANSIENT: ClassVar[tuple] = ("dirty", "history_view")
+
+
+@dataclass(slots=True)
+class DoublePigGame(Game):
+    target_score: int = None
+    round_index: int = 1
+    history: deque = field(default_factory=lambda: deque(maxlen=PIG_HISTORY_SIZE))  # последние PigRoll | PigHold
+    note: str = None                                    # разовая пометка к следующему рендеру
+
+    _TRANSIENT: ClassVar[tuple] = ("dirty", "note")
+
+    def __setstate__(self, state):
+        Game.__setstate__(self, state)
+        if not isinstance(self.history, deque) or self.history.maxlen != PIG_HISTORY_SIZE:
+            # Старые сохранения хранили полную историю списком
+            self.history = deque(self.history, maxlen=PIG_HISTORY_SIZE)
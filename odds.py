@@ -0,0 +1,159 @@
+# odds.py
+
+from functools import lru_cache
+from math import comb
+
+from engines import BlackWhiteEngine
+
+FACES = 6
+
+# 📊 Точные распределения для «Чёрные-Белые» (без сэмплирования).
+# Распределение целого результата — пара (минимальное значение, кортеж вероятностей подряд).
+# Всё, что зависит только от состава кубиков, кэшируется: наборов конечное число
+# (dice_count 4/6/8, тянут не больше 8 кубиков), поэтому клик стоит поиска в кэше.
+_CERTAIN = (0, (1.0,))
+
+
+def _convolve(a, b):
+    (offset_a, probs_a), (offset_b, probs_b) = a, b
+    out = [0.0] * (len(probs_a) + len(probs_b) - 1)
+    for i, x in enumerate(probs_a):
+        if x:
+            for j, y in enumerate(probs_b):
+                out[i + j] += x * y
+    return offset_a + offset_b, tuple(out)
+
+
+def _mix(parts):
+    """Смесь распределений: [(вес, распределение)] -> распределение."""
+    low = min(offset for _, (offset, _) in parts)
+    high = max(offset + len(probs) - 1 for _, (offset, probs) in parts)
+    out = [0.0] * (high - low + 1)
+    for weight, (offset, probs) in parts:
+        for i, p in enumerate(probs):
+            out[offset - low + i] += weight * p
+    return low, tuple(out)
+
+
+def _negate(dist):
+    offset, probs = dist
+    return -(offset + len(probs) - 1), probs[::-1]
+
+
+@lru_cache(maxsize=None)
+def _dice_sum(n):
+    """Сумма n шестигранников."""
+    if n == 0:
+        return _CERTAIN
+    return _convolve(_dice_sum(n - 1), (1, (1 / FACES,) * FACES))
+
+
+@lru_cache(maxsize=None)
+def throw_distribution(whites, blacks):
+    """Результат броска (сумма белых − сумма чёрных) при известном составе кубиков."""
+    return _convolve(_dice_sum(whites), _negate(_dice_sum(blacks)))
+
+
+@lru_cache(maxsize=None)
+def draw_distribution(white, black, count):
+    """Результат броска, если count кубиков тянут без возвращения из коробки (white, black):
+    гипергеометрическая смесь по числу вытянутых белых.
+    """
+    if count == white + black:
+        return throw_distribution(white, black)
+    total = comb(white + black, count)
+    return _mix([
+        (comb(white, k) * comb(black, count - k) / total, throw_distribution(k, count - k))
+        for k in range(max(0, count - black), min(count, white) + 1)
+    ])
+
+
+@lru_cache(maxsize=None)
+def round_difference(dice_count):
+    """Разница «первый − второй» за раунд вдвоём: первый тянет половину (k белых),
+    второму достаются h − k белых и k чёрных — то есть 2k кубиков в плюс и 2(h − k) в минус.
+    Распределение симметрично, поэтому не важно, кто из двоих начинает раунд.
+    """
+    half = dice_count // 2
+    total = comb(dice_count, half)
+    return _mix([
+        (comb(half, k) * comb(half, half - k) / total, throw_distribution(2 * k, 2 * (half - k)))
+        for k in range(half + 1)
+    ])
+
+
+@lru_cache(maxsize=None)
+def rounds_difference(dice_count, rounds):
+    """Разница вдвоём за rounds полных раундов (раунды независимы)."""
+    if rounds <= 0:
+        return _CERTAIN
+    return _convolve(rounds_difference(dice_count, rounds - 1), round_difference(dice_count))
+
+
+def _summary(dist):
+    offset, probs = dist
+    mean = round(sum((offset + i) * p for i, p in enumerate(probs)), 9) + 0.0   # без «-0.0»
+    positive = sum(p for i, p in enumerate(probs) if offset + i > 0)
+    return mean, positive
+
+
+@lru_cache(maxsize=1024)
+def throw_odds(white, black, count):
+    """(среднее, шанс результата > 0) для броска count кубиков из коробки (white, black)."""
+    return _summary(draw_distribution(white, black, count))
+
+
+@lru_cache(maxsize=4096)
+def heads_up_chances(lead, dice_count, rounds, pending=()):
+    """Шансы вдвоём: (победа, ничья по очкам, поражение) для игрока, который ведёт на lead.
+
+    rounds — сколько полных раундов ещё впереди, pending — броски текущего раунда,
+    которые ещё не сделаны: кортеж (знак, белых, чёрных), знак +1 — свой бросок, −1 — соперника.
+    Ничья по очкам решается суммой белых и здесь не разыгрывается.
+    """
+    dist = rounds_difference(dice_count, rounds)
+    for sign, whites, blacks in pending:
+        dist = _convolve(dist, throw_distribution(whites, blacks) if sign > 0 else throw_distribution(blacks, whites))
+    offset, probs = dist
+    win = tie = 0.0
+    for i, p in enumerate(probs):
+        final = lead + offset + i
+        if final > 0:
+            win += p
+        elif final == 0:
+            tie += p
+    return win, tie, max(0.0, 1.0 - win - tie)
+
+
+# 🎲 Адаптеры к состоянию партии (BlackWhiteGame)
+def next_throw_odds(game):
+    """(среднее, шанс плюса) для ближайшего броска текущего игрока; None, если он уже бросил."""
+    player = game.players[game.current_player]
+    if player.has_played_this_round:
+        return None
+    if player.pending_draw:
+        whites, blacks = player.pending_draw
+        return throw_odds(whites, blacks, whites + blacks)
+    return throw_odds(*BlackWhiteEngine.draw_plan(game))
+
+
+def heads_up_odds(game):
+    """Для партии вдвоём: ({user_id: шанс победы по очкам}, шанс ничьей по очкам); иначе None."""
+    if len(game.turn_order) != 2:
+        return None
+    first, second = game.turn_order
+    players = game.players[first], game.players[second]
+    rounds = game.rounds_total - game.current_round
+    if not any(p.has_played_this_round or p.pending_draw for p in players):
+        rounds += 1     # текущий раунд целиком впереди
+        pending = ()
+    else:
+        pool = game.pool
+        pending = tuple(
+            (sign, *(p.pending_draw or (pool.white, pool.black)))
+            for sign, p in ((1, players[0]), (-1, players[1]))
+            if not p.has_played_this_round
+        )
+    lead = players[0].score - players[1].score
+    win, tie, loss = heads_up_chances(lead, game.dice_count, rounds, pending)
+    return {first: win, second: loss}, tie
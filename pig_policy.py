@@ -0,0 +1,182 @@
+# pig_policy.py
+
+import argparse
+import itertools
+import logging
+import mmap
+import os
+import struct
+import time
+
+from engines import DoublePigEngine
+
+logger = logging.getLogger(__name__)
+
+RULES = DoublePigEngine
+# 🤖 Таблицы оптимальной стратегии лежат рядом с кодом: policies/pig_policy_<цель>.bin
+POLICY_DIR = os.getenv("PIG_POLICY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "policies"))
+# Заголовок файла: сигнатура, версия формата, цель. Дальше — биты «бросать» (1) / «хватит» (0)
+# по индексу (свой счёт, счёт соперника, очки хода) в порядке C, упакованные старшим битом вперёд.
+_MAGIC = b"PIGP"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+
+
+def policy_path(target, directory=POLICY_DIR):
+    return os.path.join(directory, f"pig_policy_{target}.bin")
+
+
+def _outcomes():
+    """Вероятности исходов броска двух кубиков по правилам движка.
+
+    -> (единица, две единицы, {сумма без дубля: p}, {прибавка за дубль: p}).
+    """
+    p = 1 / RULES.FACES ** 2
+    bust = snake = 0.0
+    plain, doubles = {}, {}
+    for d1, d2 in itertools.product(range(1, RULES.FACES + 1), repeat=2):
+        if d1 == RULES.BUST_FACE and d2 == RULES.BUST_FACE:
+            snake += p
+        elif RULES.BUST_FACE in (d1, d2):
+            bust += p
+        elif d1 == d2:
+            gain = (d1 + d2) * RULES.DOUBLE_MULTIPLIER
+            doubles[gain] = doubles.get(gain, 0.0) + p
+        else:
+            plain[d1 + d2] = plain.get(d1 + d2, 0.0) + p
+    return bust, snake, plain, doubles
+
+
+def solve(target, tol=1e-10, max_iter=10_000):
+    """Value iteration для игры двоих до target очков.
+
+    V[i, j] — шанс победы игрока, начинающего ход при счёте i против j. Внутри хода
+    очки только растут, поэтому при фиксированном V ход считается точно обратным
+    проходом по очкам хода k; снаружи V уточняется, пока не сойдётся (нужно из-за
+    двух единиц, которые отбрасывают счёт к нулю). После дубля фиксировать нельзя,
+    даже если цель уже набрана.
+
+    -> (V, roll, итераций), где roll[i, j, k] — оптимально ли бросать при k > 0 очках хода.
+    """
+    import numpy as np  # нужен только для расчёта таблиц, не боту
+
+    p_bust, p_snake, plain, doubles = _outcomes()
+    p_double = sum(doubles.values())
+    span = max(itertools.chain(plain, doubles))
+    size = target + span                                # k с запасом на самый крупный бросок
+
+    i = np.arange(target)
+    reached = (i[:, None, None] + np.arange(size)[None, None, :]) >= target    # (T, 1, K)
+    V = np.full((target, target), 0.5)
+    roll = np.ones((target, target, target), dtype=bool)
+
+    for iteration in range(1, max_iter + 1):
+        bust = 1 - V.T                                  # ход переходит сопернику: 1 - V[j, i]
+        snake = np.broadcast_to((1 - V[:, 0])[None, :], V.shape)
+        # Цель набрана, но выпал дубль: бросаем, пока не выпадет обычный бросок (победа) или единица
+        top = (p_bust * bust + p_snake * snake + (1 - p_bust - p_snake - p_double)) / (1 - p_double)
+        P = np.where(reached, 1.0, np.zeros((target, target, size)))   # значение с правом выбора
+        M = np.where(reached, top[:, :, None], 0.0)     # значение обязательного броска (после дубля)
+        for k in range(target - 1, -1, -1):
+            rows = i + k < target
+            R = p_bust * bust[rows] + p_snake * snake[rows]
+            for gain, p in plain.items():
+                R = R + p * P[rows, :, k + gain]
+            for gain, p in doubles.items():
+                R = R + p * M[rows, :, k + gain]
+            M[rows, :, k] = R
+            if k:
+                H = 1 - V[:, i[rows] + k].T             # фиксация: ход сопернику при счёте i + k
+                roll[rows, :, k] = R > H
+                P[rows, :, k] = np.maximum(R, H)
+            else:
+                P[rows, :, k] = R
+        delta = np.abs(P[:, :, 0] - V).max()
+        V = P[:, :, 0].copy()
+        if delta < tol:
+            return V, roll, iteration
+    raise RuntimeError(f"value iteration для цели {target} не сошлась за {max_iter} итераций")
+
+
+def save(path, target, roll):
+    import numpy as np
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, target))
+        f.write(np.packbits(roll, axis=None).tobytes())
+    os.replace(tmp, path)
+
+
+class PigPolicy:
+    """Таблица стратегии, отображённая в память (mmap): открытие не читает файл, а
+    should_roll — одно обращение к байту. numpy для чтения не нужен.
+    """
+
+    __slots__ = ("target", "_file", "_bits")
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._bits = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.target = _HEADER.unpack_from(self._bits)
+            expected = _HEADER.size + (self.target ** 3 + 7) // 8
+            if magic != _MAGIC or version != _VERSION or len(self._bits) != expected:
+                raise ValueError(f"{path}: не таблица стратегии версии {_VERSION}")
+        except Exception:
+            self.close()
+            raise
+
+    def should_roll(self, own, opponent, turn_points, must_roll=False):
+        """Бросать ли ещё при своём счёте own, счёте соперника opponent и turn_points очках хода."""
+        if must_roll or not turn_points:
+            return True
+        target = self.target
+        if own + turn_points >= target:
+            return False
+        index = (own * target + min(opponent, target - 1)) * target + turn_points
+        return bool(self._bits[_HEADER.size + (index >> 3)] >> (7 - (index & 7)) & 1)
+
+    def close(self):
+        bits = getattr(self, "_bits", None)
+        if bits is not None:
+            bits.close()
+        self._file.close()
+
+
+def load_policies(targets=RULES.TARGETS, directory=POLICY_DIR):
+    """Открыть таблицы для целей лобби; отсутствующие и битые пропускаются с предупреждением."""
+    policies = {}
+    started = time.perf_counter()
+    for target in targets:
+        path = policy_path(target, directory)
+        try:
+            policies[target] = PigPolicy(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"🤖 Таблица стратегии для цели {target} недоступна: {e}")
+    if policies:
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(f"🤖 Таблицы стратегии загружены ({', '.join(map(str, policies))}) за {elapsed:.2f} мс")
+    return policies
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Расчёт таблиц оптимальной стратегии «Двойной свинки»")
+    parser.add_argument("--targets", default=",".join(map(str, RULES.TARGETS)), help="цели через запятую")
+    parser.add_argument("--out", default=POLICY_DIR, help="каталог для таблиц")
+    parser.add_argument("--tol", type=float, default=1e-10, help="точность value iteration")
+    args = parser.parse_args()
+
+    for target in (int(t) for t in args.targets.split(",")):
+        started = time.perf_counter()
+        V, roll, iterations = solve(target, args.tol)
+        elapsed = time.perf_counter() - started
+        path = policy_path(target, args.out)
+        save(path, target, roll)
+        print(f"🎯 Цель {target}: {iterations} итераций за {elapsed:.1f} с, "
+              f"шанс первого хода {V[0, 0]:.4f}, {os.path.getsize(path)} байт → {path}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,140 @@
+# pig_sim.py
+
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np  # только для анализа стратегий; самому боту numpy не нужен
+
+from engines import DoublePigEngine
+
+RULES = DoublePigEngine
+# Страховка от стратегий, которые не могут закончить партию (например, порог выше цели
+# при снейк-айз): после стольких бросков оставшиеся партии считаются незавершёнными
+MAX_ROLLS = 20_000
+
+
+@dataclass(slots=True)
+class SimResult:
+    thresholds: tuple
+    target: int
+    games: int
+    wins: np.ndarray        # побед по местам (место = индекс порога в thresholds)
+    rolls: np.ndarray       # длина каждой завершённой партии в бросках
+    turns: np.ndarray       # и в ходах
+    unfinished: int         # партий, не закончившихся за max_rolls бросков
+    max_rolls: int
+    elapsed: float
+
+    @property
+    def win_rates(self):
+        return self.wins / max(1, self.games - self.unfinished)
+
+
+def simulate(thresholds, target, games=200_000, seed=None, random_start=True, max_rolls=MAX_ROLLS):
+    """Сыграть games партий «Двойной свинки» одновременно, по броску на шаг.
+
+    Место i придерживается стратегии «бросаю, пока очки хода < thresholds[i]»: после
+    броска без единицы и без дубля оно фиксирует очки, если набрало порог или этого
+    хватает до цели. Все партии идут в ногу: на каждом шаге кубики для всех живых
+    партий тянутся одним вызовом, завершённые партии выбывают из массивов.
+    """
+    rng = np.random.default_rng(seed)
+    thresholds = tuple(thresholds)
+    n_players = len(thresholds)
+    if not 2 <= n_players <= RULES.MAX_PLAYERS:
+        raise ValueError(f"Игроков должно быть от 2 до {RULES.MAX_PLAYERS}, передано {n_players}")
+    limit = np.asarray(thresholds, dtype=np.int32)
+
+    ids = np.arange(games)
+    if random_start:
+        cur = rng.integers(n_players, size=games, dtype=np.int32)
+    else:
+        cur = np.zeros(games, dtype=np.int32)
+    totals = np.zeros((games, n_players), dtype=np.int32)
+    turn = np.zeros(games, dtype=np.int32)
+    turns = np.ones(games, dtype=np.int32)
+    winner = np.full(games, -1, dtype=np.int32)
+    game_rolls = np.zeros(games, dtype=np.int32)
+    game_turns = np.zeros(games, dtype=np.int32)
+
+    started = time.perf_counter()
+    step = 0
+    while ids.size and step < max_rolls:
+        step += 1
+        n = ids.size
+        rows = np.arange(n)
+        d1, d2 = rng.integers(1, RULES.FACES + 1, size=(2, n), dtype=np.int32)
+
+        bust = (d1 == RULES.BUST_FACE) | (d2 == RULES.BUST_FACE)
+        double = d1 == d2
+        gain = np.where(double, (d1 + d2) * RULES.DOUBLE_MULTIPLIER, d1 + d2)
+        turn = np.where(bust, 0, turn + gain)
+        snake = bust & double
+        totals[rows[snake], cur[snake]] = 0
+
+        score = totals[rows, cur] + turn
+        hold = ~bust & ~double & ((turn >= limit[cur]) | (score >= target))
+        totals[rows[hold], cur[hold]] = score[hold]
+        won = hold & (score >= target)
+        passed = bust | (hold & ~won)
+        turn[hold] = 0
+        cur = np.where(passed, (cur + 1) % n_players, cur)
+        turns += passed
+
+        if won.any():
+            done = ids[won]
+            winner[done] = cur[won]
+            game_rolls[done] = step
+            game_turns[done] = turns[won]
+            alive = ~won
+            ids, cur, totals, turn, turns = ids[alive], cur[alive], totals[alive], turn[alive], turns[alive]
+
+    finished = winner >= 0
+    return SimResult(
+        thresholds=thresholds,
+        target=target,
+        games=games,
+        wins=np.bincount(winner[finished], minlength=n_players),
+        rolls=game_rolls[finished],
+        turns=game_turns[finished],
+        unfinished=int(ids.size),
+        max_rolls=max_rolls,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+def print_result(result):
+    played = result.games - result.unfinished
+    print(f"🎯 Цель {result.target}, пороги {','.join(map(str, result.thresholds))}: "
+          f"{result.games} партий за {result.elapsed:.2f} с ({result.games / result.elapsed:,.0f} партий/с)")
+    for seat, (threshold, rate) in enumerate(zip(result.thresholds, result.win_rates)):
+        stderr = (rate * (1 - rate) / max(1, played)) ** 0.5
+        print(f"   место {seat + 1} (порог {threshold}): побед {rate:.2%} ± {1.96 * stderr:.2%}")
+    if played:
+        for name, values in (("бросков", result.rolls), ("ходов", result.turns)):
+            p50, p90, p99 = np.percentile(values, (50, 90, 99))
+            print(f"   длина в {name}: среднее {values.mean():.1f}, p50 {p50:.0f}, p90 {p90:.0f}, "
+                  f"p99 {p99:.0f}, макс {values.max()}")
+    if result.unfinished:
+        print(f"   ⚠️ не закончились за {result.max_rolls} бросков: {result.unfinished}")
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Монте-Карло стратегий «Двойной свинки» (numpy)")
+    parser.add_argument("--strategy", action="append", default=None,
+                        help="пороги фиксации по местам через запятую, напр. 20,25 (можно несколько раз)")
+    parser.add_argument("--targets", default=",".join(map(str, RULES.TARGETS)), help="цели через запятую")
+    parser.add_argument("--games", type=int, default=200_000, help="партий на стратегию и цель")
+    parser.add_argument("--fixed-order", action="store_true", help="первым всегда ходит место 1")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    strategies = [tuple(int(x) for x in s.split(",")) for s in (args.strategy or ["20,25"])]
+    for target in (int(t) for t in args.targets.split(",")):
+        for thresholds in strategies:
+            print_result(simulate(thresholds, target, args.games, args.seed, not args.fixed_order))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,278 @@
+# rate_limit.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from metrics import API_CALLS, FLOOD_WAIT_SECONDS, THROTTLE_SLEEP_SECONDS
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# 📏 Лимиты Bot API (можно переопределить переменными окружения)
+GLOBAL_PER_SEC = float(os.getenv("RATE_GLOBAL_PER_SEC", "30"))
+GROUP_PER_MIN = float(os.getenv("RATE_GROUP_PER_MIN", "20"))
+PRIVATE_PER_SEC = float(os.getenv("RATE_PRIVATE_PER_SEC", "1"))
+# Правки и удаления уже отправленных сообщений не считаются новыми сообщениями чата
+# (20/мин в группе — лимит на отправку), у них свой бюджет на чат
+EDIT_PER_MIN = float(os.getenv("RATE_EDIT_PER_MIN", "60"))
+
+# Сколько раз повторять запрос после 429, прежде чем отдать RetryAfter вызывающему
+MAX_RETRIES = int(os.getenv("RATE_MAX_RETRIES", "2"))
+# Сколько вызов может ждать лимита и пауз после 429, с: дольше — RetryAfter вызывающему,
+# чтобы отправка из обработчика не держала очередь чата минутами (None в priority_args — без предела)
+MAX_WAIT = float(os.getenv("RATE_MAX_WAIT", "10"))
+
+# 🚦 Приоритеты исходящих вызовов внутри чата (меньше — раньше). Передаются через
+# rate_limit_args (см. priority_args), без них вызов идёт с PRIORITY_DEFAULT
+PRIORITY_RESULT = 0     # финальные итоги
+PRIORITY_TURN = 1       # табло: смена хода
+PRIORITY_DEFAULT = 2    # лобби, уведомления
+PRIORITY_POPUP = 3      # правила, страницы истории
+PRIORITY_CLEANUP = 4    # автоудаление
+
+# Методы, которые не относятся к конкретному чату и не должны ждать
+_UNLIMITED_ENDPOINTS = frozenset({"getUpdates", "answerCallbackQuery", "getMe", "setMyCommands",
+                                  "setWebhook", "deleteWebhook"})
+# Методы с бюджетом правок (EDIT_PER_MIN), остальные вызовы чата — бюджет отправки
+_EDIT_ENDPOINTS = frozenset({"editMessageText", "editMessageReplyMarkup", "editMessageCaption",
+                             "editMessageMedia", "deleteMessage", "deleteMessages"})
+_NO_LIMIT = object()
+
+
+class TokenBucket:
+    """Ведро токенов с резервированием: каждый запрос сразу забирает токен,
+    а если токенов нет — узнаёт, сколько ждать своей очереди."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def block(self, seconds, now):
+        # После 429 ведро уходит в минус на весь период ожидания
+        self.reserve(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def is_idle(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class PriorityGate:
+    """Очередь чата на право взять токен: ждущие проходят по приоритету, а при равном —
+    по порядку прихода. Пока чат на паузе после 429, новые важные вызовы встают вперёд
+    уже ждущих второстепенных."""
+
+    __slots__ = ("_heap", "_busy", "_seq")
+
+    def __init__(self):
+        self._heap = []         # (приоритет, порядковый номер, future)
+        self._busy = False
+        self._seq = itertools.count()
+
+    async def acquire(self, priority):
+        if not self._busy and not self._heap:
+            self._busy = True
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # очередь уже перешла к нам — передаём дальше
+            raise
+
+    def release(self):
+        while self._heap:
+            fut = heapq.heappop(self._heap)[2]
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._busy = False
+
+    def is_idle(self):
+        return not self._busy and not self._heap
+
+
+def priority_args(bot, priority, max_wait=_NO_LIMIT):
+    """kwargs вызова Bot API с приоритетом (и своим пределом ожидания, None — ждать сколько
+    нужно); rate_limit_args допустимы только при лимитере."""
+    if not getattr(bot, "rate_limiter", None):
+        return {}
+    args = {"priority": priority}
+    if max_wait is not _NO_LIMIT:
+        args["max_wait"] = max_wait
+    return {"rate_limit_args": args}
+
+
+def retry_seconds(error):
+    """RetryAfter.retry_after в секундах (int в PTB 21, timedelta в новых версиях)."""
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+# Серии метрик, которые пишутся на каждый вызов, берутся один раз
+_CHAT_SLEEP = THROTTLE_SLEEP_SECONDS.labels("chat")
+_GLOBAL_SLEEP = THROTTLE_SLEEP_SECONDS.labels("global")
+_FLOOD_WAIT = FLOOD_WAIT_SECONDS.labels()
+_api_outcomes = {}      # метод Bot API -> (ok, flood, error)
+
+
+def _outcomes(endpoint):
+    children = _api_outcomes.get(endpoint)
+    if children is None:
+        children = _api_outcomes[endpoint] = tuple(API_CALLS.labels(endpoint, o) for o in ("ok", "flood", "error"))
+    return children
+
+
+def _is_private(chat_id):
+    # У личных чатов положительный id, у групп и каналов — отрицательный или @username
+    return isinstance(chat_id, int) and chat_id > 0
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """Общий для всех игр ограничитель: глобальное ведро на бота плюс два ведра на каждый
+    чат — отправка (отдельные бюджеты для групп и личных чатов) и правки/удаления уже
+    отправленных сообщений. Работает для всех вызовов Bot API, поэтому модули игр ничего
+    не знают о лимитах.
+
+    На 429 (RetryAfter) чат ставится на паузу на весь retry_after, а запрос повторяется
+    после неё, до max_retries раз; ожидающие вызовы чата выходят по приоритету. Если
+    ожидание лимита или паузы вывело бы вызов за max_wait, вызывающий сразу получает
+    RetryAfter.
+    """
+
+    def __init__(self, global_per_sec=GLOBAL_PER_SEC, group_per_min=GROUP_PER_MIN,
+                 private_per_sec=PRIVATE_PER_SEC, edit_per_min=EDIT_PER_MIN, max_retries=MAX_RETRIES,
+                 max_wait=MAX_WAIT):
+        self.global_bucket = TokenBucket(global_per_sec, max(1.0, global_per_sec))
+        self.group_rate = group_per_min / 60
+        self.private_rate = private_per_sec
+        self.edit_rate = edit_per_min / 60
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self._chat_buckets = {}     # chat_id -> ведро отправки
+        self._edit_buckets = {}     # chat_id -> ведро правок и удалений
+        self._gates = {}            # chat_id -> PriorityGate
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self._chat_buckets.clear()
+        self._edit_buckets.clear()
+        self._gates.clear()
+
+    def _chat_bucket(self, chat_id, edit=False):
+        buckets = self._edit_buckets if edit else self._chat_buckets
+        bucket = buckets.get(chat_id)
+        if bucket is None:
+            if edit:
+                bucket = TokenBucket(self.edit_rate, 3)
+            elif _is_private(chat_id):
+                bucket = TokenBucket(self.private_rate, 3)
+            else:
+                bucket = TokenBucket(self.group_rate, 3)
+            buckets[chat_id] = bucket
+        return bucket
+
+    def prune(self):
+        """Убрать вёдра чатов, которые давно полны (чат затих)."""
+        now = time.monotonic()
+        idle = 0
+        for buckets in (self._chat_buckets, self._edit_buckets):
+            for cid in [cid for cid, b in buckets.items() if b.is_idle(now)]:
+                del buckets[cid]
+                idle += 1
+        for cid in [cid for cid, gate in self._gates.items()
+                    if gate.is_idle() and cid not in self._chat_buckets and cid not in self._edit_buckets]:
+            del self._gates[cid]
+        return idle
+
+    def _block(self, chat_id, pause):
+        # 429 относится к чату целиком: на паузу встают и отправка, и правки
+        now = time.monotonic()
+        self._chat_bucket(chat_id).block(pause, now)
+        self._chat_bucket(chat_id, edit=True).block(pause, now)
+
+    async def _wait_turn(self, chat_id, priority, edit=False, deadline=None):
+        started = time.monotonic()
+        gate = self._gates.get(chat_id)
+        if gate is None:
+            gate = self._gates[chat_id] = PriorityGate()
+        await gate.acquire(priority)
+        try:
+            bucket = self._chat_bucket(chat_id, edit)
+            now = time.monotonic()
+            delay = bucket.reserve(now)
+            if deadline is not None and now + delay > deadline:
+                bucket.tokens += 1      # вызов не состоится — токен возвращаем
+                raise RetryAfter(max(1, math.ceil(delay)))
+            if delay:
+                await asyncio.sleep(delay)
+            now = time.monotonic()
+            _CHAT_SLEEP.inc(now - started)
+            delay = self.global_bucket.reserve(now)
+            if delay:
+                await asyncio.sleep(delay)
+                _GLOBAL_SLEEP.inc(delay)
+        finally:
+            gate.release()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        ok, flood, error = _outcomes(endpoint)
+        chat_id = data.get("chat_id")
+        if endpoint in _UNLIMITED_ENDPOINTS or chat_id is None:
+            try:
+                with tracer.span(f"api:{endpoint}"):
+                    result = await callback(*args, **kwargs)
+            except Exception:
+                error.inc()
+                raise
+            ok.inc()
+            return result
+
+        rate_limit_args = rate_limit_args or {}
+        priority = rate_limit_args.get("priority", PRIORITY_DEFAULT)
+        max_wait = rate_limit_args.get("max_wait", self.max_wait)
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        edit = endpoint in _EDIT_ENDPOINTS
+        for attempt in itertools.count(1):
+            with tracer.span("throttle"):
+                await self._wait_turn(chat_id, priority, edit, deadline)
+            try:
+                with tracer.span(f"api:{endpoint}"):
+                    result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                # Пауза на весь период: ведро чата уходит в минус, повтор встанет в очередь чата
+                pause = retry_seconds(e)
+                self._block(chat_id, pause)
+                flood.inc()
+                _FLOOD_WAIT.observe(pause)
+                if attempt > self.max_retries or (deadline is not None and time.monotonic() + pause > deadline):
+                    raise
+                logger.warning(f"rate_limit: 429 для чата {chat_id} ({endpoint}), пауза {pause:g}s, "
+                               f"повтор {attempt}/{self.max_retries}")
+            except Exception:
+                error.inc()
+                raise
+            else:
+                ok.inc()
+                return result
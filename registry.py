@@ -0,0 +1,231 @@
+# registry.py
+
+import importlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from engines import Notice, Rejected
+from log_config import bind, unbind
+from metrics import HANDLER_SECONDS, metrics, timed
+from storage import persistence
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# 🎮 Модули игр, которые загружаются при старте (порядок = порядок в меню /start)
+GAME_MODULES = os.getenv("GAME_MODULES", "black_white,double_pig").split(",")
+
+# callback_data кнопок меню выбора игры: "select_game:<key>"
+SELECT_GAME = "select_game"
+
+
+@lru_cache(maxsize=1024)
+def parse_callback(data):
+    """callback_data -> (префикс, действие, аргументы).
+
+    "bw_join" -> ("bw", "join", ()), "bw_set_rounds_4" -> ("bw", "set_rounds", (4,)),
+    "select_game:double_pig" -> ("select_game", "", ("double_pig",)). Набор кнопок конечен,
+    поэтому разбор кэшируется.
+    """
+    head, sep, tail = data.partition(":")
+    if sep:
+        return head, "", (tail,)
+    prefix, _, rest = data.partition("_")
+    action, _, arg = rest.rpartition("_")
+    if action and arg.isdigit():
+        return prefix, action, (int(arg),)
+    return prefix, rest, ()
+
+
+@dataclass(slots=True)
+class Click:
+    """Нажатие кнопки, уже разобранное и привязанное к состоянию игры.
+
+    Telegram принимает только первый ответ на нажатие, поэтому обработчики не отвечают
+    сами, а задают текст через set_answer(); handle_click отправляет его один раз.
+    """
+    update: object
+    context: object
+    query: object
+    chat_id: int
+    user_id: int
+    username: str
+    args: tuple = ()
+    game: object = None
+    answer_text: str = None
+    answer_alert: bool = False
+    answered: bool = False
+
+    def set_answer(self, text, show_alert=False):
+        # Отказ (alert) важнее простого уведомления; из равных остаётся первый
+        if self.answer_text is None or (show_alert and not self.answer_alert):
+            self.answer_text = text
+            self.answer_alert = show_alert
+
+    async def send_answer(self):
+        """Ответить на нажатие (один раз); ошибка ответа не прерывает обработку."""
+        if self.answered:
+            return
+        self.answered = True
+        try:
+            await self.query.answer(self.answer_text, show_alert=self.answer_alert)
+        except Exception as e:
+            logger.error(f"❌ Не удалось ответить на нажатие в чате {self.chat_id}: {e}")
+
+
+@dataclass(slots=True)
+class GameModule:
+    """Описание игры: команды, префикс callback_data и таблица действий.
+
+    key — имя игры в меню и namespace её состояния в persistence, games — словарь
+    chat_id -> состояние. Действия регистрируются декоратором action(); обработчик
+    получает Click. Действия с needs_game=False вызываются без поднятия игры.
+    Обработчики не рисуют сами: переход помечает game.dirty, и после обработчика
+    render(chat_id, context) публикует ровно одно состояние.
+    Выход из игры (/stop, смена игры) — close(chat_id); on_close(chat_id, game) чистит
+    побочные структуры модуля (очередь правок, вспомогательные сообщения).
+    """
+    key: str
+    title: str
+    prefix: str
+    games: dict
+    start: object
+    stop: object
+    rules: object
+    render: object
+    on_close: object = None
+    actions: dict = field(default_factory=dict)     # action -> (handler, needs_game)
+
+    def action(self, name, needs_game=True):
+        def decorator(handler):
+            # Время действия пишется в bot_handler_seconds{handler="<игра>.<действие>"}
+            self.actions[name] = (timed(HANDLER_SECONDS.labels(f"{self.key}.{name}"), handler), needs_game)
+            return handler
+        return decorator
+
+    def close(self, chat_id):
+        """Убрать игру чата: состояние, побочные структуры модуля и запись об активной игре."""
+        game = self.games.pop(chat_id, None)
+        if self.on_close:
+            self.on_close(chat_id, game)
+        persistence.touch(self.key, chat_id)
+        for hook in _close_hooks:
+            hook(chat_id, self.key)
+        return game
+
+    async def handle_click(self, update, context, action, args):
+        query = update.callback_query
+        user = query.from_user
+        chat_id = query.message.chat.id
+        click = Click(update, context, query, chat_id, user.id, user.username or user.first_name, args)
+        log_token = bind(chat_id, self.key, action)
+        try:
+            entry = self.actions.get(action)
+            if entry is None:
+                return
+            handler, needs_game = entry
+            if needs_game:
+                with tracer.span("restore"):
+                    restored = await persistence.restore(self.key, chat_id)
+                if not restored:
+                    click.set_answer("Игра не найдена.", show_alert=True)
+                    return
+                click.game = self.games[chat_id]
+            with tracer.span(f"action:{self.key}.{action}"):
+                await handler(click)
+            # Ответ до рендера: правка табло не должна обогнать ответ на нажатие
+            await click.send_answer()
+            game = self.games.get(chat_id)
+            if game is not None and game.dirty:
+                game.dirty = False
+                with tracer.span("render"):
+                    await self.render(chat_id, context)
+        finally:
+            await click.send_answer()
+            unbind(log_token)
+            game = self.games.get(chat_id)
+            if game:
+                game.last_active = time.time()
+            # Чекпоинт после перехода: запись уходит в фон (write-behind)
+            persistence.touch(self.key, chat_id)
+
+
+async def apply_events(click, events):
+    """Отразить события движка (engines.py) в чате: отказ — alert нажавшему, Notice —
+    текст ответа на нажатие (click.set_answer), любое другое событие означает переход и помечает игру к рендеру.
+    """
+    for event in events:
+        kind = type(event)
+        if kind is Rejected:
+            click.set_answer(event.text, show_alert=True)
+        elif kind is Notice:
+            click.set_answer(event.text, show_alert=event.alert)
+        else:
+            click.game.dirty = True
+    return events
+
+
+_games = {}         # key -> GameModule
+_prefixes = {}      # префикс callback_data -> GameModule
+_close_hooks = []   # fn(chat_id, key) после GameModule.close (например, индекс активных игр в main)
+
+
+def register(game):
+    if game.key in _games or game.prefix in _prefixes or game.prefix == SELECT_GAME:
+        raise ValueError(f"Игра {game.key} (префикс {game.prefix}) уже зарегистрирована")
+    _games[game.key] = game
+    _prefixes[game.prefix] = game
+    game_menu_markup.cache_clear()
+    return game
+
+
+def add_close_hook(fn):
+    _close_hooks.append(fn)
+
+
+def get(key):
+    return _games.get(key)
+
+
+def by_prefix(prefix):
+    return _prefixes.get(prefix)
+
+
+def games():
+    return list(_games.values())
+
+
+def _games_by_phase():
+    counts = {}
+    for game in _games.values():
+        for state in list(game.games.values()):
+            key = (game.key, state.phase)
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+metrics.gauge("bot_games", "Игры в памяти по фазам", _games_by_phase, ("game", "phase"))
+
+
+@lru_cache(maxsize=1)
+def game_menu_markup():
+    """Клавиатура выбора игры — одна на все места, где она показывается."""
+    return InlineKeyboardMarkup(
+        [[InlineKeyboardButton(game.title, callback_data=f"{SELECT_GAME}:{game.key}")] for game in _games.values()]
+    )
+
+
+def load_games(modules=GAME_MODULES):
+    """Импортировать модули игр (они регистрируются сами); сломанный модуль не роняет бота."""
+    for name in modules:
+        try:
+            importlib.import_module(name.strip())
+        except Exception as e:
+            logger.error(f"❌ Ошибка импорта игры {name}: {e}")
+    if _games:
+        logger.info(f"✅ Загружены игры: {', '.join(_games)}")
@@ -0,0 +1,226 @@
+# rendering.py
+
+# 📏 Лимит длины текста сообщения Telegram; считается в UTF-16 code units
+TEXT_LIMIT = 4096
+# Запас под строку «📜 Раунды a–b — в истории» (её размер известен только после раскладки)
+_HIDDEN_RESERVE = 48
+
+
+def text_size(text):
+    """Длина текста так, как её считает Telegram: эмодзи вне BMP (👤, 🎲) идут за две."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def format_throw(username, throw):
+    dice_emojis = "⚪" * len(throw.whites) + "⚫" * len(throw.blacks)
+    values_str = ", ".join(map(str, throw.whites + throw.blacks))
+    sign = "+" if throw.result >= 0 else ""
+    return f"👤 {username} бросил {dice_emojis} ({values_str}) → {sign}{throw.result}"
+
+
+def format_round_summary(rnd, throws, username):
+    """Раунд одной строкой: итог каждого игрока за раунд."""
+    results = {}
+    for throw in throws:
+        results[throw.user_id] = results.get(throw.user_id, 0) + throw.result
+    return f"▫️ Раунд {rnd}: " + " · ".join(f"{username(uid)} {result:+d}" for uid, result in results.items())
+
+
+def _hidden_line(first, last):
+    rounds = f"Раунд {first}" if first == last else f"Раунды {first}–{last}"
+    return f"📜 {rounds} — в истории"
+
+
+def _fit(blocks, budget):
+    """Раскладка раундов в бюджет по заранее посчитанным размерам, без сборки текста.
+
+    blocks — [(размер целиком, размер строкой-итогом)] от старых раундов к новым; каждый
+    кусок считается с переводом строки перед ним. Сначала все раунды сворачиваются в
+    итоги, и если не влезают и они — старейшие уходят в историю; затем свежие раунды,
+    начиная с последнего, разворачиваются обратно, пока хватает места.
+    -> (скрыто, свёрнуто): столько старых раундов убрать, столько следующих свернуть.
+    """
+    n = len(blocks)
+    cost = sum(summary + 1 for _, summary in blocks) + _HIDDEN_RESERVE
+    hidden = 0
+    while hidden < n and cost > budget:
+        cost -= blocks[hidden][1] + 1
+        hidden += 1
+    folded = n - hidden
+    while folded:
+        full, summary = blocks[hidden + folded - 1]
+        if cost + full - summary > budget:
+            break
+        cost += full - summary
+        folded -= 1
+    return hidden, folded
+
+
+class ThrowHistoryCache:
+    """Инкрементальный рендер истории бросков «Чёрные-Белые».
+
+    Каждый бросок форматируется один раз, а завершённый раунд замораживается в одну
+    строку (в двух видах: для табло и для финала) и в строку-итог. Рендер табло — это
+    join готовых кусков. Источник правды — game.round_history; sync() догоняет его,
+    поэтому кэш можно не сохранять и восстановить после рестарта. Новая партия создаёт
+    новый список round_history, и кэш, увидев другой объект, начинает заново.
+
+    Вместе с кусками хранятся их размеры (text_size): раскладка под лимит сообщения
+    (board_layout, final_layout, history_page) решает, что свернуть, по сумме чисел.
+    """
+
+    __slots__ = ("_source", "_frozen_board", "_frozen_final", "_summaries", "_sizes",
+                 "_open_lines", "_open_sizes")
+
+    def __init__(self):
+        self._source = None       # round_history, по которому построен кэш
+        self._frozen_board = []   # по строке на завершённый раунд ("" если бросков не было)
+        self._frozen_final = []
+        self._summaries = []      # раунд одной строкой (format_round_summary)
+        self._sizes = []          # (табло, финал, итог) — text_size кусков выше
+        self._open_lines = []     # отформатированные броски текущего раунда
+        self._open_sizes = []
+
+    def reset(self):
+        self._source = None
+        self._frozen_board.clear()
+        self._frozen_final.clear()
+        self._summaries.clear()
+        self._sizes.clear()
+        self._open_lines.clear()
+        self._open_sizes.clear()
+
+    def sync(self, round_history, current_round, username):
+        """Догнать round_history до current_round; username(user_id) -> имя."""
+        if round_history is not self._source:
+            # История заменена целиком (новая партия) — начинаем заново
+            self.reset()
+            self._source = round_history
+        frozen = len(self._frozen_board)
+        while frozen < min(current_round - 1, len(round_history)):
+            throws = round_history[frozen]
+            self._catch_up(throws, username)
+            rnd, lines = frozen + 1, self._open_lines
+            board = f"\n*Раунд {rnd}:*\n" + "\n".join(lines) if lines else ""
+            final = f"*Раунд {rnd}:*\n" + "\n".join(lines) + "\n" if lines else ""
+            summary = format_round_summary(rnd, throws, username) if lines else ""
+            self._frozen_board.append(board)
+            self._frozen_final.append(final)
+            self._summaries.append(summary)
+            self._sizes.append((text_size(board), text_size(final), text_size(summary)))
+            self._open_lines = []
+            self._open_sizes = []
+            frozen += 1
+        if frozen < len(round_history) and frozen == current_round - 1:
+            self._catch_up(round_history[frozen], username)
+
+    def _catch_up(self, throws, username):
+        for throw in throws[len(self._open_lines):]:
+            line = format_throw(username(throw.user_id), throw)
+            self._open_lines.append(line)
+            self._open_sizes.append(text_size(line))
+
+    def _played(self):
+        """Номера завершённых раундов, в которых были броски."""
+        return [rnd for rnd, piece in enumerate(self._frozen_board, start=1) if piece]
+
+    def board_text(self, current_round):
+        """История для табло: завершённые раунды + текущий; "" если бросков ещё нет."""
+        pieces = [p for p in self._frozen_board if p]
+        if self._open_lines and len(self._frozen_board) == current_round - 1:
+            pieces.append(f"\n*Раунд {current_round}:*\n" + "\n".join(self._open_lines))
+        return "\n".join(pieces)
+
+    def board_layout(self, current_round, budget):
+        """История для табло, которая влезает в budget.
+
+        -> (текст, полная ли): если нет, старые раунды свёрнуты в итоги или убраны
+        в историю (history_page), а в крайнем случае урезан и текущий раунд.
+        """
+        is_open = bool(self._open_lines) and len(self._frozen_board) == current_round - 1
+        header = f"\n*Раунд {current_round}:*"
+        current = text_size(header) + sum(self._open_sizes) + len(self._open_sizes) if is_open else 0
+        played = self._played()
+        total = current + sum(self._sizes[rnd - 1][0] + 1 for rnd in played)
+        if total <= budget:
+            return self.board_text(current_round), True
+
+        if current + _HIDDEN_RESERVE > budget:
+            # Не влезает даже текущий раунд: свежие броски, остальное — в историю
+            room, kept = budget - text_size(header) - 2 * _HIDDEN_RESERVE, 0
+            for size in reversed(self._open_sizes):
+                if size + 1 > room:
+                    break
+                room -= size + 1
+                kept += 1
+            shown = self._open_lines[len(self._open_lines) - kept:] if kept else []
+            hidden = "\n" + _hidden_line(played[0], played[-1]) if played else ""
+            return hidden + header + "\n…\n" + "\n".join(shown), False
+
+        blocks = [(self._sizes[rnd - 1][0], self._sizes[rnd - 1][2]) for rnd in played]
+        hidden, folded = _fit(blocks, budget - current)
+        lines = []
+        if hidden:
+            lines.append(_hidden_line(played[0], played[hidden - 1]))
+        lines.extend(self._summaries[rnd - 1] for rnd in played[hidden:hidden + folded])
+        pieces = ["\n" + "\n".join(lines)] if lines else []
+        pieces.extend(self._frozen_board[rnd - 1] for rnd in played[hidden + folded:])
+        if is_open:
+            pieces.append(header + "\n" + "\n".join(self._open_lines))
+        return "\n".join(pieces), False
+
+    def final_text(self):
+        """История для финала (все раунды должны быть заморожены через sync)."""
+        return "\n".join(p for p in self._frozen_final if p)
+
+    def final_layout(self, budget):
+        """История для финала, которая влезает в budget: -> (текст, полная ли)."""
+        played = self._played()
+        if sum(self._sizes[rnd - 1][1] + 1 for rnd in played) <= budget:
+            return self.final_text(), True
+        blocks = [(self._sizes[rnd - 1][1], self._sizes[rnd - 1][2]) for rnd in played]
+        hidden, folded = _fit(blocks, budget)
+        lines = []
+        if hidden:
+            lines.append(_hidden_line(played[0], played[hidden - 1]))
+        lines.extend(self._summaries[rnd - 1] for rnd in played[hidden:hidden + folded])
+        pieces = ["\n".join(lines) + "\n"] if lines else []
+        pieces.extend(self._frozen_final[rnd - 1] for rnd in played[hidden + folded:])
+        return "\n".join(pieces), False
+
+    def history_page(self, page, budget, current_round=None):
+        """Полная история по страницам: раунды целиком, разложенные по размерам.
+
+        Текущий раунд (если current_round задан и в нём уже бросали) идёт последним,
+        раунд крупнее страницы делится по строкам. -> (текст страницы, страница, всего
+        страниц); page приводится к допустимому диапазону.
+        """
+        pieces = [(self._frozen_final[rnd - 1], self._sizes[rnd - 1][1]) for rnd in self._played()]
+        if current_round and self._open_lines and len(self._frozen_board) == current_round - 1:
+            piece = f"*Раунд {current_round}:*\n" + "\n".join(self._open_lines) + "\n"
+            pieces.append((piece, text_size(piece)))
+        pages, used = [[]], 0
+        for piece, size in pieces:
+            parts = [(piece, size)] if size < budget else _split_lines(piece, budget)
+            for part, part_size in parts:
+                if pages[-1] and used + part_size + 1 > budget:
+                    pages.append([])
+                    used = 0
+                pages[-1].append(part)
+                used += part_size + 1
+        page = min(max(page, 1), len(pages))
+        return "\n".join(pages[page - 1]), page, len(pages)
+
+
+def _split_lines(piece, budget):
+    """Кусок больше страницы -> [(часть, размер)] по целым строкам."""
+    parts, lines, used = [], [], 0
+    for line in piece.rstrip("\n").split("\n"):
+        size = text_size(line) + 1
+        if lines and used + size > budget:
+            parts.append(("\n".join(lines) + "\n", used))
+            lines, used = [], 0
+        lines.append(line)
+        used += size
+    parts.append(("\n".join(lines) + "\n", used))
+    return parts
@@ -0,0 +1,192 @@
+# sharding.py
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+logger = logging.getLogger(__name__)
+
+# 🧩 Число процессов-воркеров (0 — обычный однопроцессный режим)
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "0"))
+SUPERVISE_INTERVAL = 2.0
+
+_STOP = None  # маркер остановки в очереди воркера
+
+
+def update_chat_id(data):
+    """chat_id из сырого апдейта (dict) — только для тех типов, что обрабатывает бот."""
+    if "callback_query" in data:
+        message = data["callback_query"].get("message")
+        if message:
+            return message["chat"]["id"]
+        return data["callback_query"]["from"]["id"]
+    for key in ("message", "edited_message"):
+        if key in data:
+            return data[key]["chat"]["id"]
+    return 0
+
+
+def shard_for(chat_id, shards):
+    # int-хеш в Python детерминирован между процессами; умножение разбрасывает соседние id
+    return (chat_id * 2654435761) % (1 << 32) % shards
+
+
+class ShardRouter:
+    """Фронт-процесс: раскладывает апдейты по воркерам по хешу chat_id.
+
+    У каждого воркера своя multiprocessing.Queue, поэтому апдейты одного чата
+    обрабатываются строго по порядку. Упавший воркер перезапускается с той же
+    очередью — апдейты его шарда дожидаются его, остальные шарды не затронуты.
+    worker_target(index, shards, queue) должен быть функцией уровня модуля.
+    """
+
+    def __init__(self, shards, worker_target, mp_context="spawn"):
+        self.shards = shards
+        self.worker_target = worker_target
+        self._ctx = multiprocessing.get_context(mp_context)
+        self.queues = [self._ctx.Queue() for _ in range(shards)]
+        self.processes = [None] * shards
+        self.restarts = [0] * shards
+
+    def start(self):
+        for index in range(self.shards):
+            self._spawn(index)
+
+    def _spawn(self, index):
+        process = self._ctx.Process(
+            target=self.worker_target,
+            args=(index, self.shards, self.queues[index]),
+            name=f"bot-shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info(f"🧩 Запущен воркер шарда {index} (pid {process.pid})")
+
+    def dispatch(self, data):
+        self.queues[shard_for(update_chat_id(data), self.shards)].put(data)
+
+    def supervise(self):
+        """Перезапустить упавшие воркеры; возвращает число перезапусков."""
+        restarted = 0
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                logger.warning(f"🧩 Воркер шарда {index} завершился (код {process.exitcode}), перезапуск")
+                self.restarts[index] += 1
+                self._spawn(index)
+                restarted += 1
+        return restarted
+
+    def stop(self, timeout=10):
+        for q in self.queues:
+            q.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            if process is not None:
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.terminate()
+
+
+async def iter_worker_queue(q, poll_interval=0.5):
+    """Асинхронно читать апдейты из очереди воркера до маркера остановки."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            data = await loop.run_in_executor(None, q.get, True, poll_interval)
+        except queue.Empty:
+            continue
+        if data is _STOP:
+            return
+        yield data
+
+
+# 🤖 Воркер и фронт для Telegram-бота
+def bot_worker(index, shards, q):
+    from telegram import Update
+    import main
+    from metrics import metrics_server
+    from tracing import tracer
+
+    # У каждого воркера свои метрики — и свой порт рядом с METRICS_PORT
+    if metrics_server.enabled:
+        metrics_server.port += 1 + index
+
+    async def worker_init(application):
+        await main.start_services(application, owns=lambda chat_id: shard_for(chat_id, shards) == index)
+
+    async def run():
+        app = main.build_application(global_share=1 / shards, with_updater=False, on_init=worker_init)
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()
+        logger.info(f"🧩 Шард {index}/{shards} готов")
+        try:
+            async for data in iter_worker_queue(q):
+                update = Update.de_json(data, app.bot)
+                tracer.mark_received(update.update_id)
+                await app.update_queue.put(update)
+        finally:
+            await app.stop()
+            if app.post_shutdown:
+                await app.post_shutdown(app)
+            await app.shutdown()
+
+    asyncio.run(run())
+
+
+async def _supervise_loop(router):
+    while True:
+        await asyncio.sleep(SUPERVISE_INTERVAL)
+        router.supervise()
+
+
+async def _poll_updates(bot, router, drop_pending_updates):
+    from webhook import ALLOWED_UPDATES, is_relevant_update
+
+    await bot.delete_webhook(drop_pending_updates=drop_pending_updates)
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=ALLOWED_UPDATES,
+                                            read_timeout=40)
+        except Exception as e:
+            logger.error(f"🧩 Ошибка getUpdates: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            data = update.to_dict()
+            if is_relevant_update(data):
+                router.dispatch(data)
+
+
+async def run_front(token, shards, mode="polling", drop_pending_updates=True, on_start=None):
+    """Фронт-процесс: получает апдейты (polling или webhook) и раздаёт их воркерам."""
+    from telegram import Bot
+    from transport import build_request
+    from webhook import serve_webhook
+
+    router = ShardRouter(shards, bot_worker)
+    router.start()
+
+    async def dispatch(data):
+        router.dispatch(data)
+
+    async with Bot(token, request=build_request("front"),
+                   get_updates_request=build_request("front_updates", updates=True)) as bot:
+        if on_start:
+            await on_start(bot)
+        supervisor = asyncio.create_task(_supervise_loop(router))
+        try:
+            if mode == "webhook":
+                await serve_webhook(bot, dispatch, drop_pending_updates=drop_pending_updates)
+            else:
+                await _poll_updates(bot, router, drop_pending_updates)
+        finally:
+            supervisor.cancel()
+            router.stop()
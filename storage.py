@@ -0,0 +1,253 @@
+# storage.py
+
+import asyncio
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 💾 Хранилище состояния игр: "sqlite" (по умолчанию) или "none"
+GAME_STORE = os.getenv("GAME_STORE", "sqlite")
+GAME_STORE_PATH = os.getenv("GAME_STORE_PATH", "games.sqlite3")
+FLUSH_INTERVAL = float(os.getenv("GAME_STORE_FLUSH_INTERVAL", "0.5"))
+
+
+class GameStore:
+    """Интерфейс бэкенда: синхронные методы, вызываются из отдельного потока."""
+
+    def keys(self):
+        """Все сохранённые (namespace, chat_id)."""
+        return []
+
+    def load(self, namespace, chat_id):
+        """Сериализованное состояние или None."""
+        return None
+
+    def save_many(self, items):
+        """items: [(namespace, chat_id, blob | None)], None — удалить запись."""
+
+    def close(self):
+        pass
+
+
+class SQLiteStore(GameStore):
+    def __init__(self, path=GAME_STORE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            " namespace TEXT NOT NULL,"
+            " chat_id INTEGER NOT NULL,"
+            " state BLOB NOT NULL,"
+            " updated REAL NOT NULL,"
+            " PRIMARY KEY (namespace, chat_id))"
+        )
+
+    def keys(self):
+        with self._lock:
+            return self._conn.execute("SELECT namespace, chat_id FROM games").fetchall()
+
+    def load(self, namespace, chat_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM games WHERE namespace = ? AND chat_id = ?", (namespace, chat_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_many(self, items):
+        now = time.time()
+        upserts = [(ns, cid, blob, now) for ns, cid, blob in items if blob is not None]
+        deletes = [(ns, cid) for ns, cid, blob in items if blob is None]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT INTO games (namespace, chat_id, state, updated) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(namespace, chat_id) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+                        upserts,
+                    )
+                if deletes:
+                    self._conn.executemany("DELETE FROM games WHERE namespace = ? AND chat_id = ?", deletes)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class GamePersistence:
+    """Write-behind чекпоинты состояний игр.
+
+    Модули регистрируют свой словарь состояний (namespace -> {chat_id: state}) и
+    функции dump/load. После каждого перехода вызывается touch(): это только отметка
+    в памяти, а сериализация и запись пачкой уходят в фоновую задачу и поток.
+    Восстановление ленивое — при первом апдейте для чата (restore()).
+    """
+
+    def __init__(self, store=None, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.flush_interval = flush_interval
+        self._sources = {}      # namespace -> (states, dump, load)
+        self._dirty = set()     # {(namespace, chat_id)}
+        self._stored = None     # ключи, которые есть в хранилище (читаются один раз)
+        self._loading = {}      # (namespace, chat_id) -> asyncio.Task загрузки
+        self._archived = {}     # (namespace, chat_id) -> blob выселенной игры, ждёт записи
+        self._flusher = None
+        self._flush_lock = None     # asyncio.Lock; создаётся в _bind_loop()
+        self._loop = None
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def register(self, namespace, states, dump=pickle.dumps, load=pickle.loads):
+        self._sources[namespace] = (states, dump, load)
+
+    def touch(self, namespace, chat_id):
+        if self.store is None:
+            return
+        self._dirty.add((namespace, chat_id))
+        self._schedule_flush()
+
+    def archive(self, namespace, chat_id, state):
+        """Сохранить состояние, которое уже убрано из памяти (выселение простаивающей игры)."""
+        if self.store is None:
+            return
+        key = (namespace, chat_id)
+        self._dirty.discard(key)
+        self._archived[key] = self._sources[namespace][1](state)
+        self._schedule_flush()
+
+    def has_stored(self, namespace, chat_id):
+        """Есть ли у чата состояние в хранилище, ещё не поднятое в память."""
+        key = (namespace, chat_id)
+        return key in self._archived or (self._stored is not None and key in self._stored)
+
+    def _bind_loop(self):
+        """Lock и задачи привязаны к event loop, а main() при сбое перезапускается в новом —
+        тогда создаём их заново (несохранённые отметки в _dirty остаются)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._flush_lock = asyncio.Lock()
+            self._flusher = None
+            self._loading = {}
+        return loop
+
+    def _schedule_flush(self):
+        loop = self._bind_loop()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_later())
+
+    async def restore(self, namespace, chat_id):
+        """Поднять состояние чата из хранилища в словарь модуля. True — если нашлось."""
+        states = self._sources[namespace][0]
+        if chat_id in states:
+            return True
+        if self.store is None or (namespace, chat_id) in self._dirty:
+            return False
+        key = (namespace, chat_id)
+        loop = self._bind_loop()
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = loop.create_task(self._load(namespace, chat_id))
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        await task
+        return chat_id in states
+
+    async def restore_all(self, namespace, owns=None):
+        """Поднять все сохранённые состояния namespace (для служебных очередей, нужных целиком);
+        owns(chat_id) оставляет только свои чаты (воркер шарда)."""
+        if self.store is None:
+            return 0
+        if self._stored is None:
+            self._stored = set(await asyncio.to_thread(self.store.keys))
+        chat_ids = [chat_id for ns, chat_id in self._stored if ns == namespace]
+        chat_ids += [chat_id for ns, chat_id in self._archived if ns == namespace]
+        if owns is not None:
+            chat_ids = [chat_id for chat_id in chat_ids if owns(chat_id)]
+        for chat_id in chat_ids:
+            await self.restore(namespace, chat_id)
+        return len(chat_ids)
+
+    async def _load(self, namespace, chat_id):
+        states, _, load = self._sources[namespace]
+        blob = self._archived.pop((namespace, chat_id), None)
+        if blob is None:
+            if self._stored is None:
+                self._stored = set(await asyncio.to_thread(self.store.keys))
+            if (namespace, chat_id) not in self._stored:
+                return
+            blob = await asyncio.to_thread(self.store.load, namespace, chat_id)
+            self._stored.discard((namespace, chat_id))
+        if blob is None or chat_id in states:
+            return
+        try:
+            states[chat_id] = load(blob)
+        except Exception as e:
+            logger.error(f"💾 Не удалось восстановить {namespace}:{chat_id}: {e}")
+            return
+        logger.info(f"💾 Восстановлена игра {namespace} в чате {chat_id}")
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        self._bind_loop()
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        if not (self._dirty or self._archived) or self.store is None:
+            return
+        dirty, self._dirty = self._dirty, set()
+        archived, self._archived = self._archived, {}
+        batch = [(namespace, chat_id, blob) for (namespace, chat_id), blob in archived.items()]
+        for namespace, chat_id in dirty:
+            states, dump, _ = self._sources[namespace]
+            state = states.get(chat_id)
+            if state is None and (namespace, chat_id) in archived:
+                continue
+            try:
+                batch.append((namespace, chat_id, dump(state) if state is not None else None))
+            except Exception as e:
+                logger.error(f"💾 Не удалось сериализовать {namespace}:{chat_id}: {e}")
+        try:
+            await asyncio.to_thread(self.store.save_many, batch)
+        except Exception as e:
+            logger.error(f"💾 Ошибка записи чекпоинта: {e}")
+            self._dirty |= dirty
+            for key, blob in archived.items():
+                self._archived.setdefault(key, blob)
+            return
+        if self._stored is not None:
+            self._stored.update(archived)
+
+    async def close(self):
+        await self.flush()
+        if self.store is not None:
+            self.store.close()
+
+
+def _make_store():
+    if GAME_STORE == "sqlite":
+        try:
+            return SQLiteStore(GAME_STORE_PATH)
+        except Exception as e:
+            logger.error(f"💾 SQLite недоступен ({e}), игры не будут сохраняться")
+    return None
+
+
+# Общий экземпляр для всех игр
+persistence = GamePersistence(_make_store())
@@ -0,0 +1,142 @@
+# sweeper.py
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+
+from storage import persistence
+
+logger = logging.getLogger(__name__)
+
+# 🧹 TTL простоя по фазам игры (секунды) и период проверки
+TTL = {
+    "lobby": float(os.getenv("SWEEP_TTL_LOBBY", "3600")),
+    "choose_dice": float(os.getenv("SWEEP_TTL_LOBBY", "3600")),
+    "playing": float(os.getenv("SWEEP_TTL_PLAYING", "21600")),
+    "finished": float(os.getenv("SWEEP_TTL_FINISHED", "600")),
+}
+SWEEP_INTERVAL = float(os.getenv("SWEEP_INTERVAL", "60"))
+# Если включено, выселенные незавершённые игры остаются в хранилище и поднимутся при следующем клике
+SWEEP_ARCHIVE = os.getenv("SWEEP_ARCHIVE", "1") == "1"
+
+
+class IdleSweeper:
+    """Фоновое выселение простаивающих игр.
+
+    Модули игр регистрируют свой словарь _games (у игр есть phase и last_active) и
+    хук on_evict для своих побочных структур. Индексы вроде main.active_games
+    (chat_id -> namespace игры) чистятся вместе с играми, а осиротевшие записи —
+    если игры нет два прохода подряд. Воркер шарда передаёт в start() owns(chat_id),
+    и проход трогает только чаты своего шарда.
+    """
+
+    def __init__(self, ttl=None, interval=SWEEP_INTERVAL, archive=SWEEP_ARCHIVE):
+        self.ttl = dict(TTL if ttl is None else ttl)
+        self.interval = interval
+        self.archive = archive
+        self._sources = {}          # namespace -> (games, on_evict)
+        self._indexes = []          # [(index, index_namespace)]
+        self._cleanups = []         # функции без аргументов, вызываются после каждого прохода
+        self._orphans = set()       # (id индекса, chat_id) — кандидаты на удаление
+        self.evicted = Counter()    # (namespace, phase) -> выселено всего
+        self.owns = None            # chat_id -> bool; None — все чаты
+        self._task = None
+
+    def register(self, namespace, games, on_evict=None):
+        self._sources[namespace] = (games, on_evict)
+
+    def register_index(self, index, index_namespace):
+        self._indexes.append((index, index_namespace))
+
+    def add_cleanup(self, fn):
+        self._cleanups.append(fn)
+
+    def sweep(self, now=None):
+        """Один проход; возвращает число выселенных игр."""
+        now = time.time() if now is None else now
+        evicted = 0
+        for namespace, (games, on_evict) in self._sources.items():
+            expired = [chat_id for chat_id, game in games.items()
+                       if now - game.last_active > self.ttl.get(game.phase, self.ttl["playing"])
+                       and (self.owns is None or self.owns(chat_id))]
+            for chat_id in expired:
+                self._evict(namespace, games, on_evict, chat_id)
+                evicted += 1
+        self._sweep_indexes()
+        for fn in self._cleanups:
+            try:
+                fn()
+            except Exception as e:
+                logger.error(f"🧹 Ошибка очистки: {e}")
+        if evicted:
+            logger.info(f"🧹 Выселено простаивающих игр: {evicted}")
+        return evicted
+
+    def _evict(self, namespace, games, on_evict, chat_id):
+        game = games.pop(chat_id)
+        self.evicted[(namespace, game.phase)] += 1
+        archived = self.archive and persistence.enabled and game.phase != "finished"
+        if archived:
+            persistence.archive(namespace, chat_id, game)
+        else:
+            persistence.touch(namespace, chat_id)
+        if on_evict:
+            on_evict(chat_id)
+        if not archived:
+            # Игра ушла насовсем — из индексов её тоже убираем
+            for index, index_namespace in self._indexes:
+                if index.get(chat_id) == namespace:
+                    del index[chat_id]
+                    persistence.touch(index_namespace, chat_id)
+
+    def _sweep_indexes(self):
+        orphans = set()
+        for index, index_namespace in self._indexes:
+            for chat_id, namespace in list(index.items()):
+                if self.owns is not None and not self.owns(chat_id):
+                    continue
+                source = self._sources.get(namespace)
+                if source is None or chat_id in source[0] or persistence.has_stored(namespace, chat_id):
+                    continue
+                key = (id(index), chat_id)
+                if key in self._orphans:
+                    del index[chat_id]
+                    persistence.touch(index_namespace, chat_id)
+                else:
+                    orphans.add(key)
+        self._orphans = orphans
+
+    def stats(self):
+        live = Counter()
+        for namespace, (games, _) in self._sources.items():
+            for game in games.values():
+                live[(namespace, game.phase)] += 1
+        return {
+            "live": dict(live),
+            "evicted": dict(self.evicted),
+            "indexed": sum(len(index) for index, _ in self._indexes),
+        }
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"🧹 Ошибка прохода очистки: {e}")
+
+    def start(self, owns=None):
+        self.owns = owns
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+# Общий экземпляр для всех игр
+sweeper = IdleSweeper()
@@ -0,0 +1,269 @@
+# tracing.py
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import deque
+
+from metrics import metrics_server
+
+logger = logging.getLogger(__name__)
+
+# 🔍 Трассировка апдейтов: доля трассируемых апдейтов (0 — выключено), файл JSONL
+# (пусто — только кольцевой буфер в памяти, отдаётся по GET TRACE_PATH сервера метрик)
+TRACE_SAMPLE = float(os.getenv("TRACE_SAMPLE", "0"))
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_RING = int(os.getenv("TRACE_RING", "256"))
+TRACE_PATH = os.getenv("TRACE_PATH", "/traces")
+
+# Трасса текущего апдейта; у нетрассируемых — None
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Трасса одного апдейта: фазы (span) с началом и длительностью относительно приёма.
+
+    Трасса закрывается, когда отпущены все её держатели: обработка в почтовом ящике и
+    каждая правка, которую обработчик поставил в очередь (edit_scheduler.py). Поэтому в
+    трассу попадает и ожидание в очереди правок, и сам вызов editMessageText.
+    """
+
+    __slots__ = ("update_id", "chat_id", "kind", "started", "wall", "spans", "_holds", "_tracer")
+
+    def __init__(self, tracer, update_id, chat_id, kind, started):
+        self._tracer = tracer
+        self.update_id = update_id
+        self.chat_id = chat_id
+        self.kind = kind
+        self.started = started          # time.perf_counter() приёма апдейта
+        self.wall = time.time()
+        self.spans = []                 # (имя, начало, конец) в perf_counter
+        self._holds = 0
+
+    def add(self, name, start, end):
+        self.spans.append((name, start, end))
+
+    def hold(self):
+        self._holds += 1
+        return self
+
+    def release(self):
+        self._holds -= 1
+        if self._holds == 0:
+            self._tracer.finish(self)
+
+    def to_record(self, finished):
+        ms = 1000.0
+        return {
+            "ts": round(self.wall, 3),
+            "update": self.update_id,
+            "chat": self.chat_id,
+            "kind": self.kind,
+            "total_ms": round((finished - self.started) * ms, 3),
+            "spans": [[name, round((start - self.started) * ms, 3), round((end - start) * ms, 3)]
+                      for name, start, end in self.spans],
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start, time.perf_counter())
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def update_kind(update):
+    """Короткое имя апдейта для отчёта: callback_data кнопки или команда."""
+    query = getattr(update, "callback_query", None)
+    if query is not None:
+        return f"callback:{query.data}"
+    message = getattr(update, "effective_message", None)
+    text = getattr(message, "text", None) or ""
+    return f"command:{text.split(maxsplit=1)[0]}" if text.startswith("/") else "update"
+
+
+class Tracer:
+    def __init__(self, sample=TRACE_SAMPLE, path=TRACE_FILE, ring=TRACE_RING):
+        self.sample = sample
+        self.path = path
+        self.recent = deque(maxlen=ring)    # последние закрытые трассы (записи)
+        self.finished = 0
+        self._received = {}                 # update_id -> perf_counter приёма
+        self._fd = None
+
+    @property
+    def enabled(self):
+        return self.sample > 0
+
+    def mark_received(self, update_id):
+        """Время приёма апдейта до очереди Application; первая отметка остаётся
+        (webhook и шарды ставят её раньше, чем апдейт попадёт в ReceivedQueue)."""
+        if self.sample > 0 and update_id not in self._received:
+            self._received[update_id] = time.perf_counter()
+
+    def begin(self, update, chat_id):
+        """Начать трассу апдейта, если он попал в выборку; -> Trace (с одним держателем) или None."""
+        if self.sample <= 0:
+            return None
+        now = time.perf_counter()
+        received = self._received.pop(update.update_id, None)
+        if random.random() >= self.sample:
+            return None
+        trace = Trace(self, update.update_id, chat_id, update_kind(update), received or now)
+        if received is not None:
+            trace.add("app_queue", received, now)
+        return trace.hold()
+
+    def finish(self, trace):
+        record = trace.to_record(time.perf_counter())
+        self.recent.append(record)
+        self.finished += 1
+        if self.path:
+            self._write(record)
+
+    def _write(self, record):
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self._fd, line)
+        except OSError as e:
+            logger.error(f"❌ Файл трасс {self.path} недоступен, пишем только в память: {e}")
+            self.path = ""
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # Контекст: трасса текущего апдейта видна обработчику и вызовам Bot API из него
+    @staticmethod
+    def current():
+        return _current.get()
+
+    @staticmethod
+    def activate(trace):
+        return _current.set(trace)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    @staticmethod
+    def span(name):
+        """with tracer.span("render"): ... — фаза текущей трассы; без трассы ничего не стоит."""
+        trace = _current.get()
+        return _Span(trace, name) if trace is not None else _NO_SPAN
+
+    async def handle_recent(self, body, headers):
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self.recent)
+        return 200, payload.encode(), "application/x-ndjson"
+
+
+# 📈 Отчёт: самые медленные трассы и среднее время по фазам
+def read(source):
+    """Записи трасс из файла JSONL или по URL (GET TRACE_PATH сервера метрик)."""
+    if source.startswith(("http://", "https://")):
+        import urllib.request
+        with urllib.request.urlopen(source, timeout=10) as response:
+            lines = response.read().decode("utf-8").splitlines()
+    else:
+        with open(source, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue    # оборванная последняя строка
+    return records
+
+
+def summarize(records, top=10, kind=None):
+    if kind:
+        records = [r for r in records if r["kind"].startswith(kind)]
+    if not records:
+        print("Трасс нет.")
+        return
+    totals = sorted(r["total_ms"] for r in records)
+    p50, p95 = (totals[min(len(totals) - 1, int(q * len(totals)))] for q in (0.5, 0.95))
+    print(f"🔍 Трасс: {len(records)}, всего мс: p50 {p50:.1f}, p95 {p95:.1f}, макс {totals[-1]:.1f}")
+
+    phases = {}
+    for record in records:
+        per_trace = {}
+        for name, _, ms in record["spans"]:
+            per_trace[name] = per_trace.get(name, 0.0) + ms
+        for name, ms in per_trace.items():
+            count, total = phases.get(name, (0, 0.0))
+            phases[name] = (count + 1, total + ms)
+    # Фазы вложены (handler включает action и render), поэтому доли в сумме больше 100%
+    print(f"\n{'фаза':<28}{'трасс':>7}{'среднее, мс':>13}{'доля':>7}")
+    grand = sum(totals)
+    for name, (count, total) in sorted(phases.items(), key=lambda item: -item[1][1]):
+        print(f"{name:<28}{count:>7}{total / count:>13.2f}{total / grand:>7.0%}")
+
+    print(f"\n🐢 Самые медленные ({min(top, len(records))}):")
+    for record in sorted(records, key=lambda r: -r["total_ms"])[:top]:
+        stamp = time.strftime("%H:%M:%S", time.localtime(record["ts"]))
+        print(f"  {stamp} чат {record['chat']} {record['kind']}: {record['total_ms']:.1f} мс")
+        for name, start, ms in sorted(record["spans"], key=lambda span: span[1]):
+            print(f"      +{start:>8.1f} {name:<24}{ms:>9.1f}")
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Сводка трасс апдейтов (TRACE_FILE или URL сервера метрик)")
+    parser.add_argument("source", help=f"файл JSONL или URL, например http://127.0.0.1:9100{TRACE_PATH}")
+    parser.add_argument("--top", type=int, default=10, help="сколько самых медленных трасс показать")
+    parser.add_argument("--kind", default=None, help="только апдейты с таким началом kind, например callback:bw_")
+    args = parser.parse_args()
+    records = read(args.source)
+    summarize(records, args.top, args.kind)
+    sys.exit(0 if records else 1)
+
+
+class ReceivedQueue(asyncio.Queue):
+    """update_queue Application, отмечающая приём каждого апдейта: в polling Updater кладёт
+    апдейты сразу сюда, и без отметки у трассы не было бы фазы "app_queue"."""
+
+    def put_nowait(self, item):
+        update_id = getattr(item, "update_id", None)
+        if update_id is not None:
+            tracer.mark_received(update_id)
+        super().put_nowait(item)
+
+
+# Общий экземпляр для всех модулей
+tracer = Tracer()
+metrics_server.add_route(TRACE_PATH, tracer.handle_recent)
+
+
+if __name__ == "__main__":
+    _main()
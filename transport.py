@@ -0,0 +1,139 @@
+# transport.py
+
+import logging
+import os
+import time
+
+import httpx
+from telegram.error import TimedOut
+from telegram.request import HTTPXRequest
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 🔌 HTTP-транспорт Bot API. Профиль задаёт пулы соединений и таймауты для исходящих вызовов
+# (send/edit/delete) и отдельно для getUpdates; любое поле можно переопределить переменной
+# окружения из _ENV ниже. "ptb" — как было без настройки (значения PTB 21 и httpx по умолчанию)
+HTTP_PROFILE = os.getenv("HTTP_PROFILE", "tuned")
+
+PROFILES = {
+    "ptb": {
+        "pool_size": 256, "keepalive": 5.0, "http2": False,
+        "connect_timeout": 5.0, "read_timeout": 5.0, "write_timeout": 5.0, "pool_timeout": 1.0,
+        "updates_pool_size": 1, "updates_read_timeout": 5.0,
+    },
+    # Соединения живут между всплесками правок (httpx по умолчанию закрывает их через 5 с
+    # простоя, и следующий всплеск начинается с новых TCP+TLS), а вызов ждёт свободного
+    # соединения, а не падает через 1 с с TimedOut, так и не уйдя в Telegram.
+    # Пул умеренный: лимитер и так держит не больше ~30 вызовов/с, а httpcore при каждой
+    # постановке и освобождении запроса перебирает все соединения для всех ждущих
+    # запросов — 256 простаивающих keep-alive соединений стоят заметного CPU
+    # (см. benchmarks/bench_transport.py)
+    "tuned": {
+        "pool_size": 32, "keepalive": 60.0, "http2": False,
+        "connect_timeout": 5.0, "read_timeout": 10.0, "write_timeout": 5.0, "pool_timeout": 10.0,
+        "updates_pool_size": 2, "updates_read_timeout": 5.0,
+    },
+}
+
+_ENV = {
+    "pool_size": ("HTTP_POOL_SIZE", int),
+    "keepalive": ("HTTP_KEEPALIVE", float),         # секунд держать простаивающее соединение
+    "http2": ("HTTP_HTTP2", lambda v: v == "1"),    # нужен пакет h2 (python-telegram-bot[http2])
+    "connect_timeout": ("HTTP_CONNECT_TIMEOUT", float),
+    "read_timeout": ("HTTP_READ_TIMEOUT", float),
+    "write_timeout": ("HTTP_WRITE_TIMEOUT", float),
+    "pool_timeout": ("HTTP_POOL_TIMEOUT", float),
+    "updates_pool_size": ("HTTP_UPDATES_POOL_SIZE", int),
+    "updates_read_timeout": ("HTTP_UPDATES_READ_TIMEOUT", float),   # к нему PTB добавляет long-poll timeout
+}
+
+
+def profile_settings(profile=HTTP_PROFILE):
+    """Настройки профиля с учётом переопределений из окружения."""
+    if profile not in PROFILES:
+        logger.error(f"❌ Неизвестный HTTP_PROFILE={profile}, используем tuned")
+        profile = "tuned"
+    settings = dict(PROFILES[profile])
+    for field, (env, cast) in _ENV.items():
+        value = os.getenv(env)
+        if value:
+            settings[field] = cast(value)
+    return settings
+
+
+# 📊 Насыщение пулов: сколько запросов сейчас в полёте и сколько из них ждали соединения
+_pools = {}     # имя пула -> MeteredRequest
+
+HTTP_IN_FLIGHT = metrics.gauge(
+    "bot_http_in_flight", "Запросы к Bot API в полёте по пулу",
+    lambda: {(name,): request.in_flight for name, request in _pools.items()}, ("pool",))
+HTTP_POOL_SIZE = metrics.gauge(
+    "bot_http_pool_size", "Размер пула соединений",
+    lambda: {(name,): request.pool_size for name, request in _pools.items()}, ("pool",))
+HTTP_POOL_WAITS = metrics.counter(
+    "bot_http_pool_waits_total", "Запросы, заставшие все соединения пула занятыми (HTTP/1.1)", ("pool",))
+HTTP_POOL_TIMEOUTS = metrics.counter(
+    "bot_http_pool_timeouts_total", "Запросы, не дождавшиеся соединения (не отправлены)", ("pool",))
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "bot_http_request_seconds", "Длительность HTTP-запроса к Bot API, включая ожидание пула", ("pool",))
+
+
+class MeteredRequest(HTTPXRequest):
+    """HTTPXRequest со своим keepalive_expiry и счётчиками насыщения пула."""
+
+    def __init__(self, name, keepalive=5.0, **kwargs):
+        self.name = name
+        self.pool_size = kwargs.get("connection_pool_size", 1)
+        self.in_flight = 0
+        self._keepalive = keepalive
+        self._waits = HTTP_POOL_WAITS.labels(name)
+        self._pool_timeouts = HTTP_POOL_TIMEOUTS.labels(name)
+        self._seconds = HTTP_REQUEST_SECONDS.labels(name)
+        super().__init__(**kwargs)
+        _pools[name] = self
+
+    def _build_client(self):
+        # HTTPXRequest не принимает keepalive_expiry — подменяем лимиты перед сборкой клиента
+        limits = self._client_kwargs["limits"]
+        self._client_kwargs["limits"] = httpx.Limits(
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=self._keepalive,
+        )
+        return super()._build_client()
+
+    async def do_request(self, *args, **kwargs):
+        self.in_flight += 1
+        if self.in_flight > self.pool_size and self.http_version == "1.1":
+            self._waits.inc()
+        started = time.perf_counter()
+        try:
+            return await super().do_request(*args, **kwargs)
+        except TimedOut as e:
+            if isinstance(e.__cause__, httpx.PoolTimeout):
+                self._pool_timeouts.inc()
+            raise
+        finally:
+            self.in_flight -= 1
+            self._seconds.observe(time.perf_counter() - started)
+
+
+def build_request(name, updates=False, settings=None):
+    """Транспорт для ApplicationBuilder.request() или (updates=True) .get_updates_request()."""
+    settings = settings or profile_settings()
+    kwargs = {
+        "connection_pool_size": settings["updates_pool_size" if updates else "pool_size"],
+        "connect_timeout": settings["connect_timeout"],
+        "read_timeout": settings["updates_read_timeout" if updates else "read_timeout"],
+        "write_timeout": settings["write_timeout"],
+        "pool_timeout": settings["pool_timeout"],
+    }
+    # getUpdates — один долгий запрос, мультиплексирование ему ни к чему
+    if settings["http2"] and not updates:
+        try:
+            return MeteredRequest(name, settings["keepalive"], http_version="2", **kwargs)
+        except RuntimeError as e:
+            logger.error(f"❌ HTTP/2 недоступен, используем HTTP/1.1: {e}")
+    return MeteredRequest(name, settings["keepalive"], **kwargs)
@@ -0,0 +1,232 @@
+# webhook.py
+
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+# 🌐 Настройки webhook-режима
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")    # пусто — сгенерируется при set_webhook (нужен WEBHOOK_URL)
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Сколько ждать очередной строки или тела запроса (и простаивающее keep-alive соединение), с —
+# для webhook и сервера метрик; HTTP_* в transport.py — исходящие вызовы Bot API
+WEBHOOK_READ_TIMEOUT = float(os.getenv("WEBHOOK_READ_TIMEOUT", "30"))
+
+# Бот обрабатывает только команды и нажатия кнопок
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+_MAX_BODY = 1 << 20
+_MAX_HEADERS = 64
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 431: "Request Header Fields Too Large"}
+
+
+def is_relevant_update(data):
+    """Предфильтр: пропускаем только нажатия кнопок и текстовые команды."""
+    if "callback_query" in data:
+        return True
+    message = data.get("message")
+    if message:
+        return message.get("text", "").startswith("/")
+    return False
+
+
+class HTTPServer:
+    """Минимальный HTTP/1.1 сервер на asyncio streams: routes = {(method, path): handler},
+    handler(body: bytes, headers: dict) -> (status, body, content_type).
+    На весь запрос (строка запроса, заголовки, тело) и на простой keep-alive соединения даётся
+    read_timeout: медленный или молчащий клиент отключается, даже если присылает по строке."""
+
+    def __init__(self, routes, host, port, read_timeout=WEBHOOK_READ_TIMEOUT):
+        self.routes = routes
+        self.host = host
+        self.port = port
+        self.read_timeout = read_timeout
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🌐 HTTP сервер слушает {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @staticmethod
+    async def _read(operation, deadline):
+        return await asyncio.wait_for(operation, deadline - asyncio.get_running_loop().time())
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                deadline = loop.time() + self.read_timeout
+                request_line = await self._read(reader.readline(), deadline)
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, b"", close=True)
+                    break
+                headers = {}
+                for _ in range(_MAX_HEADERS + 1):
+                    line = await self._read(reader.readline(), deadline)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                else:
+                    await self._respond(writer, 431, b"", close=True)
+                    break
+
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, b"", close=True)
+                    break
+                if length > _MAX_BODY:
+                    await self._respond(writer, 413, b"", close=True)
+                    break
+                body = await self._read(reader.readexactly(length), deadline) if length else b""
+
+                handler = self.routes.get((method, path.split("?", 1)[0]))
+                if handler is None:
+                    status, payload, content_type = 404, b"", "text/plain"
+                else:
+                    status, payload, content_type = await handler(body, headers)
+                close = headers.get("connection", "").lower() == "close"
+                await self._respond(writer, status, payload, content_type, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.TimeoutError):
+            pass    # клиент ушёл или молчит дольше read_timeout
+        except Exception as e:
+            logger.error(f"❌ Ошибка HTTP сервера: {e}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, content_type="text/plain", close=False):
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+
+def make_webhook_handler(dispatch, secret=WEBHOOK_SECRET):
+    """Обработчик POST с апдейтом: проверка секрета, предфильтр, передача в dispatch(data)."""
+    if not secret:
+        raise ValueError("Webhook без секрета принимал бы поддельные апдейты от кого угодно")
+
+    async def handle(body, headers):
+        if not hmac.compare_digest(headers.get("x-telegram-bot-api-secret-token", ""), secret):
+            return 403, b"", "text/plain"
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400, b"", "text/plain"
+        if not isinstance(data, dict):
+            return 400, b"", "text/plain"
+        # Telegram не должен повторять отброшенные апдейты, поэтому всегда 200
+        if is_relevant_update(data):
+            await dispatch(data)
+        return 200, b"", "text/plain"
+
+    return handle
+
+
+async def serve_webhook(bot, dispatch, url=WEBHOOK_URL, secret=WEBHOOK_SECRET, listen=WEBHOOK_LISTEN,
+                        port=WEBHOOK_PORT, path=WEBHOOK_PATH, drop_pending_updates=True):
+    """Поднять HTTP сервер и зарегистрировать webhook; работает до отмены."""
+    if not secret:
+        if not url:
+            raise RuntimeError("Webhook без WEBHOOK_SECRET не запускается: задайте секрет "
+                               "или WEBHOOK_URL, чтобы бот сам зарегистрировал webhook со случайным секретом")
+        # Секрет живёт до перезапуска: при каждом старте set_webhook регистрирует новый
+        secret = secrets.token_urlsafe(32)
+        logger.info("🔐 WEBHOOK_SECRET не задан — сгенерирован случайный секрет для set_webhook")
+    server = HTTPServer({("POST", path): make_webhook_handler(dispatch, secret)}, listen, port)
+    await server.start()
+    if url:
+        await bot.set_webhook(
+            url=url.rstrip("/") + path,
+            secret_token=secret,
+            allowed_updates=ALLOWED_UPDATES,
+            drop_pending_updates=drop_pending_updates,
+        )
+        logger.info(f"✅ Webhook установлен: {url.rstrip('/') + path}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+async def run_webhook(application, drop_pending_updates=True, **kwargs):
+    """Запуск бота в режиме webhook вместо run_polling."""
+    from tracing import tracer      # tracing -> metrics -> webhook: импорт только здесь
+
+    async def dispatch(data):
+        update = Update.de_json(data, application.bot)
+        tracer.mark_received(update.update_id)
+        await application.update_queue.put(update)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        await serve_webhook(application.bot, dispatch, drop_pending_updates=drop_pending_updates, **kwargs)
+    finally:
+        await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
+
+
+# 🧪 Локальный клиент: отправка записанных апдейтов на webhook
+async def post_updates(url, updates, secret=""):
+    import httpx
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    statuses = []
+    async with httpx.AsyncClient() as client:
+        for update in updates:
+            response = await client.post(url, json=update, headers=headers)
+            statuses.append(response.status_code)
+    return statuses
+
+
+def _replay_main():
+    parser = argparse.ArgumentParser(description="Отправить записанные апдейты (JSONL) на webhook")
+    parser.add_argument("file", help="файл JSONL, по одному апдейту в строке")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    parser.add_argument("--secret", default=WEBHOOK_SECRET)
+    args = parser.parse_args()
+
+    with open(args.file, encoding="utf-8") as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    statuses = asyncio.run(post_updates(args.url, updates, args.secret))
+    print(f"Отправлено {len(statuses)} апдейтов, ответы: {dict((s, statuses.count(s)) for s in set(statuses))}")
+
+
+if __name__ == "__main__":
+    _replay_main()